@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, select
+
+from database import DailyStats, Flashcard
+from perf import timed
+
+class ProgressStats:
+    """
+    Long-term progress figures for one user, computed in the database.
+
+    Card counts are GROUP BY / SUM(CASE) queries over the user's index
+    ranges and review history comes from the daily_stats summary table,
+    so only a few aggregate rows per query reach Python however many
+    cards the user has. Tables come back as pandas DataFrames, ready for
+    st.bar_chart, st.line_chart and st.dataframe.
+    """
+
+    DUE_WINDOWS = {'now': timedelta(0), 'next_24h': timedelta(days=1), 'next_7d': timedelta(days=7)}
+
+    def __init__(self, db):
+        self.db = db
+
+    @timed('analytics.box_counts')
+    def box_counts(self, username):
+        """Number of cards in each box, 1-5"""
+        flashcards = Flashcard.__table__
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(
+                select(flashcards.c.box_number, func.count())
+                .where(flashcards.c.user_id == username)
+                .group_by(flashcards.c.box_number)
+            ).all()
+        counts = dict.fromkeys(range(1, 6), 0)
+        counts.update({box: count for box, count in rows if box in counts})
+        return counts
+
+    @timed('analytics.due_counts')
+    def due_counts(self, username, now=None):
+        """Cards due now, within a day and within a week, in one pass over the due-date index"""
+        now = now or datetime.utcnow()
+        flashcards = Flashcard.__table__
+        horizon = max(self.DUE_WINDOWS.values())
+        with self.db.engine.connect() as conn:
+            row = conn.execute(
+                select(*[func.coalesce(func.sum(case((flashcards.c.next_review <= now + window, 1), else_=0)), 0)
+                         for window in self.DUE_WINDOWS.values()])
+                .where(flashcards.c.user_id == username, flashcards.c.next_review <= now + horizon)
+            ).one()
+        return dict(zip(self.DUE_WINDOWS, row))
+
+    @timed('analytics.accuracy_by_day')
+    def accuracy_by_day(self, username, days=30, today=None):
+        """Reviews, correct answers and accuracy for each of the last `days` days that had reviews"""
+        import pandas as pd  # Deferred: only the dashboard needs it
+
+        today = today or datetime.utcnow().date()
+        stats = DailyStats.__table__
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(
+                select(stats.c.day, func.sum(stats.c.reviews), func.sum(stats.c.correct))
+                .where(stats.c.user_id == username, stats.c.day > today - timedelta(days=days))
+                .group_by(stats.c.day)
+                .order_by(stats.c.day)
+            ).all()
+        frame = pd.DataFrame(rows, columns=['day', 'reviews', 'correct'])
+        frame['accuracy'] = frame['correct'] / frame['reviews']
+        return frame.set_index('day')
+
+    @timed('analytics.topic_retention')
+    def topic_retention(self, username, days=30, today=None):
+        """Share of correct answers per topic over the last `days` days, weakest topics first"""
+        import pandas as pd
+
+        today = today or datetime.utcnow().date()
+        stats = DailyStats.__table__
+        reviews = func.sum(stats.c.reviews)
+        with self.db.engine.connect() as conn:
+            rows = conn.execute(
+                select(stats.c.topic, reviews, func.sum(stats.c.correct))
+                .where(stats.c.user_id == username, stats.c.day > today - timedelta(days=days))
+                .group_by(stats.c.topic)
+            ).all()
+        frame = pd.DataFrame(rows, columns=['topic', 'reviews', 'correct'])
+        frame['topic'] = frame['topic'].replace('', "(no topic)")
+        frame['retention'] = frame['correct'] / frame['reviews']
+        return frame.sort_values('retention').reset_index(drop=True)
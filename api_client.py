@@ -0,0 +1,197 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+# Rate limited and overloaded; both clear up if callers back off
+RETRY_STATUSES = frozenset({429, 529})
+
+class LimiterBusy(Exception):
+    """No request slot freed up within the caller's timeout"""
+
+class QueueStats:
+    """Thread-safe record of how long requests waited for a slot"""
+
+    def __init__(self, window=500):
+        self._waits = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.in_flight = 0
+        self.total = 0
+        self.timeouts = 0
+        self.retries = 0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self._waits.append(seconds)
+            self.total += 1
+
+    def snapshot(self):
+        """Current queue depth plus wait statistics over the recent window"""
+        with self._lock:
+            waits = sorted(self._waits)
+            snapshot = {
+                'waiting': self.waiting,
+                'in_flight': self.in_flight,
+                'requests': self.total,
+                'timeouts': self.timeouts,
+                'retries': self.retries
+            }
+        snapshot['wait_mean_ms'] = 1000 * sum(waits) / len(waits) if waits else 0.0
+        snapshot['wait_p95_ms'] = 1000 * waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        snapshot['wait_max_ms'] = 1000 * waits[-1] if waits else 0.0
+        return snapshot
+
+    def increment(self, name, delta=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+class ConcurrencyLimiter:
+    """Caps the process's in-flight API requests; callers beyond the cap queue up"""
+
+    def __init__(self, max_in_flight=8, stats=None):
+        self.max_in_flight = max_in_flight
+        self.stats = stats or QueueStats()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    @contextmanager
+    def slot(self, timeout=None):
+        start = time.monotonic()
+        self.stats.increment('waiting')
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            self.stats.increment('waiting', -1)
+        if not acquired:
+            self.stats.increment('timeouts')
+            raise LimiterBusy(f"No API slot free after {timeout}s")
+        self.stats.record_wait(time.monotonic() - start)
+
+        self.stats.increment('in_flight')
+        try:
+            yield
+        finally:
+            self.stats.increment('in_flight', -1)
+            self._slots.release()
+
+def retry_delay(attempt, base_delay, max_delay, error=None):
+    """Full-jitter exponential backoff, honouring a retry-after header when present"""
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), max_delay)
+    except ValueError:
+        pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+def is_retryable(error):
+    return getattr(error, 'status_code', None) in RETRY_STATUSES
+
+class LimitedMessages:
+    """messages.create/stream that go through the shared limiter and back off on 429/529"""
+
+    def __init__(self, messages, limiter, max_retries, base_delay, max_delay, queue_timeout, sleep=time.sleep):
+        self._messages = messages
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self._sleep = sleep
+
+    def _with_retries(self, call):
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_delay(attempt, self.base_delay, self.max_delay, e)
+                logger.warning("API returned %s, retrying in %.1fs", e.status_code, delay)
+                self.limiter.stats.increment('retries')
+                attempt += 1
+            # Callers take a slot per attempt, so backing off never holds one
+            self._sleep(delay)
+
+    def create(self, **kwargs):
+        def call():
+            with self.limiter.slot(self.queue_timeout):
+                return self._messages.create(**kwargs)
+        return self._with_retries(call)
+
+    @contextmanager
+    def stream(self, **kwargs):
+        def call():
+            with ExitStack() as stack:
+                stack.enter_context(self.limiter.slot(self.queue_timeout))
+                stream = stack.enter_context(self._messages.stream(**kwargs))
+                # Opened: keep the slot past this attempt
+                return stack.pop_all(), stream
+        opened, stream = self._with_retries(call)
+        # The slot is held until the caller finishes reading the stream
+        with opened:
+            yield stream
+
+class LimitedClient:
+    """Wraps an Anthropic client so every request shares one limiter and retry policy"""
+
+    def __init__(self, client, limiter=None, max_retries=4, base_delay=1.0, max_delay=30.0,
+                 queue_timeout=60.0, sleep=time.sleep):
+        self.client = client
+        self.limiter = limiter or ConcurrencyLimiter()
+        self.messages = LimitedMessages(client.messages, self.limiter, max_retries,
+                                        base_delay, max_delay, queue_timeout, sleep)
+
+    @property
+    def stats(self):
+        return self.limiter.stats
+
+CLIENT_DEFAULTS = {
+    'max_in_flight': 8,
+    'max_retries': 4,
+    'base_delay': 1.0,
+    'max_delay': 30.0,
+    'queue_timeout': 60.0,
+    'max_connections': 20,
+    'max_keepalive_connections': 10,
+    'keepalive_expiry': 60.0,
+    'timeout': 60.0
+}
+
+def get_client_options():
+    """CLIENT_DEFAULTS overridden by the optional [anthropic_client] section of secrets"""
+    return {**CLIENT_DEFAULTS, **dict(st.secrets.get('anthropic_client', {}))}
+
+@st.cache_resource(show_spinner=False)
+def get_anthropic_client():
+    """Process-wide client so HTTP connections are kept alive and reused across reruns"""
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    options = get_client_options()
+    http_client = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=options['max_connections'],
+            max_keepalive_connections=options['max_keepalive_connections'],
+            keepalive_expiry=options['keepalive_expiry']
+        ),
+        timeout=options['timeout']
+    )
+    # Retries happen in LimitedMessages, which can release the slot while waiting
+    client = Anthropic(api_key=st.secrets["anthropic_api_key"], http_client=http_client, max_retries=0)
+    return LimitedClient(
+        client,
+        limiter=ConcurrencyLimiter(options['max_in_flight']),
+        max_retries=options['max_retries'],
+        base_delay=options['base_delay'],
+        max_delay=options['max_delay'],
+        queue_timeout=options['queue_timeout']
+    )
@@ -1,15 +1,17 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import streamlit_authenticator as stauth
-from database import UserDB
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from auth import Authenticator
+from database import UserDB, question_hash
 import json
-import re
-from claude_service import ClaudeService
+import time
+from functools import partial
+from passwords import HashingBusy
+from perf import RECORDER, get_prometheus_exporter, span
 from flashcard_ui import (
     show_error, show_progress, show_question, show_answer_input, 
     show_feedback, show_difficulty_buttons, show_next_button, 
-    initialize_session, show_study_session_summary
+    initialize_session, show_study_session_summary, show_progress_dashboard, show_deck_transfer,
+    load_theme
 )
 
 # After imports
@@ -19,189 +21,13 @@ st.set_page_config(
     layout="centered"
 )
 
-# Custom CSS
-st.markdown("""
-<style>
-    /* Color variables */
-    :root {
-        --primary-blue: #3b71ca;
-        --primary-blue-hover: #4f8df5;
-        --success-green: #257953;
-        --success-bg: #f0faf4;
-        --success-border: #dcfce7;
-        --error-red: #cc0f35;
-        --error-bg: #fff3f5;
-        --error-border: #fecdd3;
-        --neutral-gray: #e5e7eb;
-        --text-dark: #1f2937;
-    }
-
-    /* Override any red borders/text except for errors */
-    *:not([data-baseweb="notification"][class*="error"]) {
-        border-color: var(--neutral-gray) !important;
-        color: inherit !important;
-    }
-
-    /* Remove hover border color changes */
-    *:not([data-baseweb="notification"][class*="error"]):focus,
-    *:not([data-baseweb="notification"][class*="error"]):hover {
-        border-color: var(--neutral-gray) !important;
-    }
-
-    /* Preserve specific text colors */
-    .stButton button {
-        color: white !important;
-    }
-
-    [data-testid="stFormSubmitButton"] button {
-        color: var(--primary-blue) !important;
-    }
-
-    /* Base card styling */
-    .stMarkdown div.stMarkdown {
-        background-color: white;
-        padding: 1.5rem;
-        border-radius: 10px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        margin: 1rem 0;
-    }
-
-    /* Button styling - prevent any red flashes */
-    .stButton button,
-    .stButton button:hover,
-    .stButton button:active,
-    .stButton button:focus,
-    .stButton button:visited {
-        border-radius: 20px;
-        padding: 0.5rem 1.5rem;
-        transition: all 0.3s ease;
-        font-weight: 500;
-        box-shadow: 0 2px 4px rgba(59, 113, 202, 0.1);
-        border-color: transparent !important;
-        outline: none !important;
-    }
-
-    /* Regular buttons - all states */
-    .stButton button:not([data-testid="stFormSubmitButton"]),
-    .stButton button:not([data-testid="stFormSubmitButton"]):hover,
-    .stButton button:not([data-testid="stFormSubmitButton"]):active,
-    .stButton button:not([data-testid="stFormSubmitButton"]):focus {
-        background: linear-gradient(135deg, var(--primary-blue) 0%, var(--primary-blue-hover) 100%);
-        color: white !important;
-        border: none !important;
-    }
-
-    /* Form submit button - all states */
-    [data-testid="stFormSubmitButton"] button,
-    [data-testid="stFormSubmitButton"] button:hover,
-    [data-testid="stFormSubmitButton"] button:active,
-    [data-testid="stFormSubmitButton"] button:focus {
-        background: white;
-        color: var(--primary-blue) !important;
-        border: 2px solid var(--primary-blue) !important;
-    }
-
-    /* Button specific hover states */
-    .stButton button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 4px 12px rgba(59, 113, 202, 0.2);
-        color: white !important;
-    }
-
-    [data-testid="stFormSubmitButton"] button:hover {
-        color: var(--primary-blue) !important;
-    }
-
-    /* Input fields */
-    .stTextArea textarea {
-        border-radius: 10px;
-        border: 2px solid var(--neutral-gray) !important;
-        padding: 1rem;
-        font-size: 1rem;
-        transition: all 0.3s ease;
-    }
-
-    .stTextArea textarea:focus {
-        border-color: var(--primary-blue) !important;
-        box-shadow: 0 0 0 3px rgba(59, 113, 202, 0.1);
-    }
-
-    /* Success and error messages */
-    div[data-baseweb="notification"][class*="success"] {
-        background-color: var(--success-bg) !important;
-        color: var(--success-green) !important;
-        border-left: 4px solid var(--success-green);
-        border-radius: 8px;
-        padding: 1rem;
-    }
-
-    div[data-baseweb="notification"][class*="error"] {
-        background-color: var(--error-bg) !important;
-        color: var(--error-red) !important;
-        border-left: 4px solid var(--error-red);
-        border-radius: 8px;
-        padding: 1rem;
-    }
-
-    /* Progress bar */
-    .stProgress > div > div > div {
-        background: linear-gradient(90deg, var(--primary-blue) 0%, var(--primary-blue-hover) 100%);
-        height: 8px;
-        border-radius: 4px;
-    }
-
-    /* Metrics */
-    [data-testid="stMetricValue"] {
-        font-size: 1.8rem;
-        color: var(--text-dark);
-        font-weight: 600;
-    }
+# Theme stylesheet, served from ./static so browsers cache it across reruns
+load_theme()
 
-    /* Question card */
-    .question-card {
-        background: white;
-        padding: 2rem;
-        border-radius: 12px;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
-        margin: 1.5rem 0;
-        border: 1px solid var(--neutral-gray);
-    }
-
-    .question-card h3 {
-        color: var(--text-dark);
-        margin: 0;
-        font-weight: 600;
-    }
-
-    /* Remove link icons */
-    .stMarkdown a::after,
-    .stMarkdown a::before,
-    a.external-link::after,
-    a.internal-link::after {
-        content: none !important;
-        display: none !important;
-    }
-
-    /* Hide any other auto-generated icons */
-    .stMarkdown svg.icon {
-        display: none !important;
-    }
-
-    /* Preset topic buttons */
-    [data-testid="stFormSubmitButton"]:not(:last-child) button {
-        min-height: 0;
-        padding: 0.3rem;
-        white-space: pre-line;
-        line-height: 1.2;
-        font-size: 0.9rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Initialize database
+# Initialize database (engine and connection pool are shared process-wide)
 db = UserDB()
 
-# Get credentials from database
+# Credentials are resolved lazily, one username at a time
 config = {
     'credentials': db.get_user_credentials(),
     'cookie': {
@@ -212,7 +38,7 @@ config = {
 }
 
 # Create authentication object
-authenticator = stauth.Authenticate(
+authenticator = Authenticator(
     config['credentials'],
     config['cookie']['name'],
     config['cookie']['key'],
@@ -242,14 +68,26 @@ elif authentication_status == None:
                 else:
                     try:
                         db.validate_signup(new_username, new_email, new_password)
-                        db.add_user(new_username, new_email, new_name, new_password)
+                        with st.spinner("Creating your account..."):
+                            db.add_user(new_username, new_email, new_name, new_password)
                         st.success("Registration successful! Please log in.")
-                    except ValueError as e:
+                    except (ValueError, HashingBusy) as e:
                         st.error(str(e))
                     except Exception as e:
                         st.error("Registration failed. Please try again.")
 
 elif authentication_status:
+    # Study modules load on the first signed-in rerun, keeping them (and
+    # anthropic, httpx and numpy behind them) off the login page's cold start
+    from analytics import ProgressStats
+    from api_client import get_anthropic_client
+    from caches import DeckCache, get_feedback_cache, normalize_topic
+    from claude_service import ClaudeService, DeckStream
+    from grading import CACHED, LLM, get_grader
+    from prefetch import get_prefetcher
+    from response_parser import parse_batch_feedback
+    from review_writer import get_review_buffer
+    
     authenticator.logout('Logout', 'sidebar')
     st.write(f'Welcome *{name}*')
     
@@ -272,10 +110,30 @@ elif authentication_status:
     
     load_config()
     
+    if debug_mode:
+        st.sidebar.write("Grader hit rates:", get_grader().stats.hit_rates())
+        st.sidebar.write("Claude API queue:", get_anthropic_client().stats.snapshot())
+        st.sidebar.write("Latency by span (recent):")
+        st.sidebar.dataframe([{'span': name, **row} for name, row in RECORDER.summary().items()],
+                             hide_index=True)
+    
+    def export_metrics():
+        exporter = get_prometheus_exporter()
+        if exporter is not None:
+            exporter.maybe_export()
+    
     class FlashcardApp:
-        def __init__(self):
-            self.db = UserDB()
+        DUE_CARDS_LIMIT = 20
+        FIRST_CARD_TIMEOUT = 60  # seconds
+        
+        def __init__(self, db):
+            self.db = db
+            self.reviews = get_review_buffer()
             self.claude = ClaudeService()
+            self.deck_cache = DeckCache(db)
+            self.grader = get_grader()
+            self.feedback_cache = get_feedback_cache()
+            self.prefetcher = get_prefetcher()
             self.init_session_state()
         
         def init_session_state(self):
@@ -304,25 +162,42 @@ elif authentication_status:
                     'difficulty': difficulty
                 })
                 
-                # Save to database
-                self.db.save_flashcard_result(
+                # Buffer for the background writer instead of committing inline
+                self.reviews.add(self.db.review_params(
                     username=username,
                     question=current_card['question'],
                     answer=current_card['answer'],
                     is_correct=is_correct,
-                    difficulty=difficulty
-                )
+                    difficulty=difficulty,
+                    topic=st.session_state.get('study_topic'),
+                    latency_ms=st.session_state.get('answer_latency_ms'),
+                    grader_tier=(st.session_state.feedback or {}).get('tier')
+                ))
+            
+            # A streaming deck may still be generating the next card
+            self.wait_for_card(len(st.session_state.session_results))
             
             # Show summary if all cards are reviewed
             if len(st.session_state.session_results) >= len(st.session_state.current_cards):
+                self.reviews.flush()
                 st.session_state.update({
                     'session_complete': True,
                     'clearing_session': False,  # Don't clear yet
                     'show_form_only': False     # Keep showing the current UI
                 })
+                st.rerun()  # the summary lives outside the card region
             else:
                 self.next_card()
-            st.rerun()
+        
+        def deck_finished(self):
+            deck_stream = st.session_state.get('deck_stream')
+            return deck_stream is None or deck_stream.done
+        
+        def wait_for_card(self, index):
+            deck_stream = st.session_state.get('deck_stream')
+            if deck_stream is not None and not deck_stream.done:
+                with st.spinner("Loading the next card..."):
+                    deck_stream.wait_for(index + 1, timeout=self.FIRST_CARD_TIMEOUT)
         
         def next_card(self):
             st.session_state.current_index += 1
@@ -332,9 +207,18 @@ elif authentication_status:
                 'show_answer': False,
                 'user_answer': "",
                 'feedback': None,
-                'difficulty': None
+                'difficulty': None,
+                'card_shown_at': None,
+                'answer_latency_ms': None
             })
-            st.rerun()
+            self.rerun_card()
+        
+        @staticmethod
+        def rerun_card():
+            """Rerun only the card region when handling a click inside it, else the whole app"""
+            # Fragment-scoped reruns are only allowed while a fragment rerun is in progress
+            ctx = get_script_run_ctx()
+            st.rerun(scope="fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
         
         def run(self):
             try:
@@ -349,7 +233,9 @@ elif authentication_status:
 
                 # Show summary if session is complete
                 if st.session_state.get('session_complete'):
+                    self.show_grading_retry()
                     show_study_session_summary(st.session_state.get('session_results', []))
+                    self.show_continue_option()
                     return
 
                 # Only show form if in reset state or session complete
@@ -357,6 +243,9 @@ elif authentication_status:
                     # Clear any existing UI
                     st.empty()
                     
+                    self.show_due_review_option()
+                    self.show_deck_tools()
+                    
                     # Show only the form
                     with st.form(key='flashcard_form'):
                         topic = st.text_input(
@@ -375,6 +264,8 @@ elif authentication_status:
                         with col3:
                             amendments_clicked = st.form_submit_button("📜 US\nAmendments", use_container_width=True)
                         
+                        grade_at_end = st.checkbox("📝 Grade all answers at the end")
+                        
                         # Add spacing before main button
                         st.markdown("<br>", unsafe_allow_html=True)
                         
@@ -392,6 +283,7 @@ elif authentication_status:
                         # Generate flashcards if we have a topic
                         if (amino_clicked or provinces_clicked or amendments_clicked or 
                             (generate_clicked and topic)):
+                            st.session_state['grade_at_end'] = grade_at_end
                             self.generate_flashcards(topic)
                             st.session_state['show_form_only'] = False
                             st.session_state['session_complete'] = False
@@ -402,6 +294,9 @@ elif authentication_status:
                 if st.session_state.get('current_cards'):
                     self.show_current_card()
                 else:
+                    self.show_due_review_option()
+                    self.show_deck_tools()
+                    
                     # Show the form if no cards are present
                     with st.form(key='flashcard_form'):
                         st.markdown("##### Create New Flashcards")
@@ -410,23 +305,268 @@ elif authentication_status:
                             value="Amino acids",
                             placeholder="e.g., Photosynthesis, French Revolution, Python Programming"
                         )
+                        grade_at_end = st.checkbox("📝 Grade all answers at the end")
                         if st.form_submit_button("✨ Generate Flashcards", use_container_width=True):
+                            st.session_state['grade_at_end'] = grade_at_end
                             self.generate_flashcards(topic)
                             st.rerun()
             except Exception as e:
                 show_error(f"Application error: {str(e)}", show_state=True)
         
+        def show_due_review_option(self):
+            due_count = self.db.count_due_cards(username)
+            if due_count and st.button(f"📚 Review due cards ({due_count})", use_container_width=True):
+                self.start_due_review()
+                st.rerun()
+        
+        def show_deck_tools(self):
+            # Aggregates are only queried while the dashboard is open
+            if st.toggle("📈 Show my progress", key="show_progress"):
+                show_progress_dashboard(ProgressStats(self.db), username)
+            show_deck_transfer(self.db, username)
+        
+        def start_due_review(self):
+            # Due cards come straight from Postgres; no Claude call needed
+            due_cards = (self.take_prefetched(self.next_deck_key(None))
+                         or self.db.get_due_cards(username, limit=self.DUE_CARDS_LIMIT))
+            if not due_cards:
+                show_error("No cards are due for review.")
+                return
+            self.start_session(due_cards, topic=None)
+            st.session_state.update({
+                'session_results': [],
+                'show_form_only': False,
+                'session_complete': False
+            })
+        
+        def start_session(self, cards, topic, deck_stream=None):
+            st.session_state.update({
+                'current_cards': cards,
+                # Unlike current_cards, kept after the session ends, until the next deck starts
+                'studied_cards': cards,
+                'study_topic': topic,
+                'deck_stream': deck_stream,
+                'pending_answers': [],
+                'pending_latencies': [],
+                'grading_error': None,
+                'current_index': 0,
+                'show_answer': False,
+                'user_answer': "",
+                'feedback': None,
+                'difficulty': None,
+                'card_shown_at': None,
+                'answer_latency_ms': None
+            })
+        
+        def next_deck_key(self, topic):
+            """Prefetch key for a follow-up deck on topic, or for due cards when topic is None"""
+            return ('topic', normalize_topic(topic)) if topic else ('due', username)
+        
+        def prefetch_next_deck(self):
+            """Prepare the follow-up deck in the background while this one is studied"""
+            topic = st.session_state.get('study_topic')
+            if topic:
+                prepare = partial(self.prepare_deck, self.claude, self.deck_cache, topic)
+            else:
+                studied = {card['question'] for card in st.session_state.current_cards}
+                prepare = partial(self.prepare_due_cards, self.db, username, studied, self.DUE_CARDS_LIMIT)
+            self.prefetcher.request(self.next_deck_key(topic), prepare)
+        
+        def take_prefetched(self, key, timeout=0):
+            """
+            The prefetched deck for key without the questions of the last deck
+            studied, or None. Filtered here rather than when prefetching: that
+            deck may still have been streaming in when the prefetch started.
+            """
+            cards = self.prefetcher.take(key, timeout=timeout) or []
+            studied = {question_hash(card['question']) for card in st.session_state.get('studied_cards') or []}
+            return [card for card in cards if question_hash(card['question']) not in studied] or None
+        
+        @staticmethod
+        def prepare_deck(claude, deck_cache, topic):
+            # Runs on a prefetch thread: no Streamlit calls
+            cards = deck_cache.get(topic, claude.cards_per_session, claude.model)
+            if cards is None:
+                # A separate flight: joining the deck still streaming in would serve it again
+                cards = list(claude.stream_flashcards(topic, kind='prefetch'))
+                if cards:
+                    deck_cache.put(topic, claude.model, cards)
+            return cards
+        
+        @staticmethod
+        def prepare_due_cards(db, username, studied, limit):
+            # Cards from the current session may not have been written back yet
+            due_cards = db.get_due_cards(username, limit=limit + len(studied))
+            return [card for card in due_cards if card['question'] not in studied][:limit]
+        
+        def show_continue_option(self):
+            topic = st.session_state.get('study_topic')
+            key = self.next_deck_key(topic)
+            if not self.prefetcher.pending(key):
+                return
+            label = f"⚡ Continue with {topic}" if topic else "⚡ Review more due cards"
+            if st.button(label, use_container_width=True):
+                with st.spinner("Preparing your next deck..."):
+                    cards = self.take_prefetched(key, timeout=self.FIRST_CARD_TIMEOUT)
+                if cards:
+                    self.start_session(cards, topic)
+                    st.session_state.update({
+                        'session_results': [],
+                        'session_complete': False,
+                        'clearing_session': False,
+                        'show_form_only': False
+                    })
+                else:
+                    st.session_state.update({
+                        'session_complete': False,
+                        'show_form_only': True
+                    })
+                st.rerun()
+        
         def show_current_card(self):
-            current_card = st.session_state.current_cards[st.session_state.current_index]
+            self.prefetch_next_deck()
+            self.show_card_region()
+        
+        @st.fragment
+        def show_card_region(self):
+            # Clicks in here (Check Answer, ratings, Next Card) rerun only this
+            # region; login, config and service setup above are left alone
+            try:
+                with span('app.card_rerun'):
+                    current_card = st.session_state.current_cards[st.session_state.current_index]
+                    total_cards = len(st.session_state.current_cards)
+                    
+                    show_progress(st.session_state.current_index, total_cards)
+                    show_question(current_card['question'])
+                    
+                    if st.session_state.get('grade_at_end'):
+                        self.handle_deferred_answer(current_card)
+                    elif not st.session_state.show_answer:
+                        self.handle_answer_input()
+                    else:
+                        self.show_answer_and_feedback(current_card)
+            finally:
+                if get_script_run_ctx().fragment_ids_this_run:
+                    export_metrics()
+        
+        @staticmethod
+        def mark_card_shown():
+            if st.session_state.get('card_shown_at') is None:
+                st.session_state['card_shown_at'] = time.monotonic()
+        
+        @staticmethod
+        def answer_latency_ms():
+            """Milliseconds from first showing the current card until now"""
+            shown_at = st.session_state.get('card_shown_at')
+            return None if shown_at is None else round((time.monotonic() - shown_at) * 1000)
+        
+        def handle_deferred_answer(self, current_card):
+            # Grade-at-end mode: collect answers locally, grade them all in one request
+            pending = st.session_state.setdefault('pending_answers', [])
+            latencies = st.session_state.setdefault('pending_latencies', [])
             total_cards = len(st.session_state.current_cards)
+            self.mark_card_shown()
+            user_answer = show_answer_input(key=f"answer_input_{st.session_state.current_index}")
             
-            show_progress(st.session_state.current_index, total_cards)
-            show_question(current_card['question'])
+            is_last_card = self.deck_finished() and len(pending) >= total_cards - 1
+            if show_next_button(text="Submit Answers" if is_last_card else "Next Card"):
+                if len(pending) < total_cards:
+                    pending.append({
+                        'question': current_card['question'],
+                        'answer': current_card['answer'],
+                        'user_answer': user_answer
+                    })
+                    latencies.append(self.answer_latency_ms())
+                self.wait_for_card(len(pending))
+                if len(pending) >= len(st.session_state.current_cards):
+                    self.grade_session(pending)
+                else:
+                    self.next_card()
+        
+        def local_verdict(self, item):
+            """
+            Feedback from the local grader or the feedback cache, or None if the
+            answer has to go to Claude; escalations are counted by the tier that serves them
+            """
+            verdict = self.grader.grade(**item)
+            if verdict is None:
+                verdict = self.feedback_cache.get(**item)
+                self.grader.stats.record(LLM if verdict is None else CACHED)
+            return verdict
+        
+        def grade_session(self, pending):
+            # Local grader and feedback cache first; everything else in one batched request
+            verdicts = [self.local_verdict(item) for item in pending]
+            remaining = [i for i, verdict in enumerate(verdicts) if verdict is None]
+            error = None
             
-            if not st.session_state.show_answer:
-                self.handle_answer_input()
-            else:
-                self.show_answer_and_feedback(current_card)
+            if remaining:
+                try:
+                    with st.spinner("Grading your answers..."):
+                        response = self.claude.create_batch_feedback([pending[i] for i in remaining])
+                    graded = parse_batch_feedback(response, count=len(remaining))
+                    for position, i in enumerate(remaining):
+                        if position in graded:
+                            verdicts[i] = {**graded[position], 'tier': LLM}
+                            self.feedback_cache.put(feedback=verdicts[i], **pending[i])
+                except Exception as e:
+                    error = f"Failed to grade answers: {str(e)}"
+            
+            latencies = st.session_state.get('pending_latencies', [])
+            # Earlier results are kept when this is a retry of the answers left ungraded
+            results = list(st.session_state.get('session_results') or [])
+            ungraded = []
+            for i, (item, verdict) in enumerate(zip(pending, verdicts)):
+                latency_ms = latencies[i] if i < len(latencies) else None
+                if verdict is None:
+                    # Not saved as a miss: that would move the card down a box for our failure
+                    ungraded.append((item, latency_ms))
+                    continue
+                # No self-rating in this mode: correct answers stay in their box, misses move down
+                difficulty = "medium" if verdict['correct'] else "hard"
+                results.append({
+                    'question': item['question'],
+                    'correct_answer': item['answer'],
+                    'user_answer': item['user_answer'],
+                    'correct': verdict['correct'],
+                    'explanation': verdict['explanation'],
+                    'difficulty': difficulty
+                })
+                self.reviews.add(self.db.review_params(
+                    username=username,
+                    question=item['question'],
+                    answer=item['answer'],
+                    is_correct=verdict['correct'],
+                    difficulty=difficulty,
+                    topic=st.session_state.get('study_topic'),
+                    latency_ms=latency_ms,
+                    grader_tier=verdict.get('tier')
+                ))
+            self.reviews.flush()
+            if ungraded and error is None:
+                error = f"{len(ungraded)} answers were missing from the grading response."
+            
+            # The error is shown on the summary, since the rerun below would wipe it
+            st.session_state.update({
+                'session_results': results,
+                'pending_answers': [item for item, _ in ungraded],
+                'pending_latencies': [latency_ms for _, latency_ms in ungraded],
+                'grading_error': error if ungraded else None,
+                'session_complete': True,
+                'clearing_session': False,
+                'show_form_only': False
+            })
+            st.rerun()
+        
+        def show_grading_retry(self):
+            """Report answers the batched request couldn't grade and offer to grade them again"""
+            ungraded = st.session_state.get('pending_answers')
+            if not ungraded or not st.session_state.get('grading_error'):
+                return
+            show_error(st.session_state['grading_error'])
+            st.caption(f"{len(ungraded)} answers were not graded or saved yet.")
+            if st.button("🔁 Retry grading", use_container_width=True):
+                self.grade_session(ungraded)
 
         def generate_flashcards(self, topic):
             try:
@@ -435,88 +575,52 @@ elif authentication_status:
                     if st.session_state.get('debug_mode', False):
                         st.write("DEBUG: Attempting to create flashcards for topic:", topic)
                     
-                    response = self.claude.create_flashcards(topic)
-                    if st.session_state.get('debug_mode', False):
-                        st.write("DEBUG: Raw response from Claude:", response)
+                    count = self.claude.cards_per_session
+                    model = self.claude.model
+                    deck_stream = None
+                    # A deck prefetched for this topic is used first, then the deck cache
+                    flashcards = (self.take_prefetched(self.next_deck_key(topic), timeout=self.FIRST_CARD_TIMEOUT)
+                                  or self.deck_cache.get(topic, count, model))
+                    if flashcards is not None:
+                        if st.session_state.get('debug_mode', False):
+                            st.write("DEBUG: Served flashcards from deck cache:", flashcards)
+                    else:
+                        # Start studying as soon as the first card has streamed in;
+                        # the rest of the deck keeps arriving in the background
+                        deck_cache = self.deck_cache
+                        deck_stream = DeckStream(
+                            self.claude.stream_flashcards(topic),
+                            on_complete=lambda cards: deck_cache.put(topic, model, cards)
+                        ).start()
+                        deck_stream.wait_for(1, timeout=self.FIRST_CARD_TIMEOUT)
+                        flashcards = deck_stream.cards
                     
                     try:
-                        flashcards = self.clean_and_parse_json(response)
+                        if deck_stream is not None and deck_stream.error and not flashcards:
+                            raise deck_stream.error
                         if st.session_state.get('debug_mode', False):
-                            st.write("DEBUG: Parsed flashcards:", flashcards)
+                            st.write("DEBUG: Flashcards received so far:", list(flashcards))
                         
                         if flashcards and isinstance(flashcards, list) and len(flashcards) > 0:
-                            st.session_state.update({
-                                'current_cards': flashcards,
-                                'current_index': 0,
-                                'show_answer': False,
-                                'user_answer': "",
-                                'feedback': None,
-                                'difficulty': None
-                            })
-                            st.write("DEBUG: Successfully updated session state with flashcards")
+                            self.start_session(flashcards, topic, deck_stream)
                         else:
                             show_error("No valid flashcards were generated. Response was empty or invalid.", show_state=True)
                     except Exception as parse_error:
-                        st.write("DEBUG: Failed to parse response:", str(parse_error))
                         show_error(f"Failed to process flashcards: {str(parse_error)}", show_state=True)
                         if st.session_state.get('debug_mode', False):
-                            st.write("Raw response that failed parsing:", response)
+                            st.write("Cards received before the failure:", list(flashcards or []))
             except Exception as e:
-                st.write("DEBUG: Top-level error in generate_flashcards:", str(e))
                 show_error(f"Failed to generate flashcards: {str(e)}", show_state=True)
                 if st.session_state.get('debug_mode', False):
                     st.write("Full error details:", e)
                     import traceback
                     st.code(traceback.format_exc())
 
-        def clean_and_parse_json(self, response_text):
-            try:
-                # Handle Anthropic API response structure
-                if hasattr(response_text, 'content') and hasattr(response_text.content[0], 'text'):
-                    response_text = response_text.content[0].text
-                
-                # Try direct JSON parsing first
-                if st.session_state.get('debug_mode', False):
-                    st.write("DEBUG: Attempting direct JSON parse")
-                return json.loads(str(response_text).strip())
-            except json.JSONDecodeError as e:
-                if st.session_state.get('debug_mode', False):
-                    st.write(f"DEBUG: Direct JSON parse failed: {str(e)}")
-                try:
-                    # Try to find JSON object or array
-                    text = str(response_text).strip()
-                    if text.strip().startswith('{'):
-                        # Handle single JSON object
-                        return json.loads(text)
-                    else:
-                        # Handle JSON array
-                        match = re.search(r'\[(.*?)\]', text, re.DOTALL)
-                        if match:
-                            try:
-                                # Clean up the extracted JSON
-                                json_str = match.group(0)
-                                json_str = json_str.replace('\n', ' ').replace('\\n', ' ')
-                                json_str = re.sub(r'\s+', ' ', json_str)
-                                
-                                if st.session_state.get('debug_mode', False):
-                                    st.write("DEBUG: Attempting to parse cleaned JSON:", json_str)
-                                return json.loads(json_str)
-                            except Exception as e:
-                                if st.session_state.get('debug_mode', False):
-                                    st.write(f"DEBUG: Failed to parse cleaned JSON: {str(e)}")
-                                raise
-                    
-                    if st.session_state.get('debug_mode', False):
-                        st.write("DEBUG: No valid JSON found in response")
-                    raise ValueError("No valid JSON found in response")
-                except Exception as e:
-                    if st.session_state.get('debug_mode', False):
-                        st.write(f"DEBUG: Error in cleanup process: {str(e)}")
-                    raise
-
         def handle_answer_input(self):
+            self.mark_card_shown()
             user_answer = show_answer_input()
             if st.button("Check Answer"):
+                st.session_state['answer_latency_ms'] = self.answer_latency_ms()
                 if st.session_state.get('debug_mode', False):
                     st.write("DEBUG: Starting answer check")
                     st.write("DEBUG: User answer:", user_answer)
@@ -533,32 +637,32 @@ elif authentication_status:
                 if st.session_state.get('debug_mode', False):
                     st.write("DEBUG: Feedback prompt:", feedback_prompt_json)
                 
-                feedback_response = self.claude.create_feedback(json.loads(feedback_prompt_json))
-                
-                if st.session_state.get('debug_mode', False):
-                    st.write("DEBUG: Raw feedback response:", feedback_response)
+                # Obvious verdicts are graded locally and repeated answers come from
+                # the feedback cache; only new, ambiguous answers reach Claude
+                local_feedback = self.local_verdict(feedback_prompt)
+                if local_feedback is not None:
+                    st.session_state.update({
+                        'user_answer': user_answer,
+                        'show_answer': True,
+                        'feedback': local_feedback
+                    })
+                    self.rerun_card()
                 
                 try:
-                    cleaned_response = self.clean_and_parse_json(feedback_response)
+                    # create_feedback returns an already validated verdict
+                    feedback = self.claude.create_feedback(json.loads(feedback_prompt_json))
                     if st.session_state.get('debug_mode', False):
-                        st.write("DEBUG: Cleaned feedback response:", cleaned_response)
-                    
-                    # Validate feedback format
-                    if isinstance(cleaned_response, list):
-                        cleaned_response = cleaned_response[0]
-                    
-                    if not isinstance(cleaned_response, dict) or 'correct' not in cleaned_response or 'explanation' not in cleaned_response:
-                        raise ValueError("Invalid feedback format")
+                        st.write("DEBUG: Parsed feedback response:", feedback)
                     
+                    self.feedback_cache.put(feedback=feedback, **feedback_prompt)
                     st.session_state.update({
                         'user_answer': user_answer,
                         'show_answer': True,
-                        'feedback': cleaned_response
+                        'feedback': {**feedback, 'tier': LLM}
                     })
                 except Exception as e:
                     if st.session_state.get('debug_mode', False):
                         st.write("DEBUG: Error processing feedback:", str(e))
-                        st.write("DEBUG: Response type:", type(feedback_response))
                         st.write("DEBUG: Full error:", e)
                         import traceback
                         st.code(traceback.format_exc())
@@ -572,25 +676,24 @@ elif authentication_status:
                             "explanation": f"Error evaluating answer: {str(e)}"
                         }
                     })
-                st.rerun()
+                self.rerun_card()
 
         def show_answer_and_feedback(self, current_card):
             is_correct = show_feedback(current_card['answer'], 
                                      st.session_state.user_answer, 
                                      st.session_state.feedback)
             
-            is_last_card = len(st.session_state.session_results) >= len(st.session_state.current_cards) - 1
+            is_last_card = (self.deck_finished() and
+                            len(st.session_state.session_results) >= len(st.session_state.current_cards) - 1)
             
             if is_correct:
                 clicked = show_difficulty_buttons(disabled=False)
                 if any(clicked.values()):
                     difficulty = next(k for k, v in clicked.items() if v)
-                    st.write("DEBUG: Difficulty button clicked:", difficulty)
                     self.handle_card_completion(difficulty, is_correct)
             else:
                 button_text = "Show Summary" if is_last_card else "Next Card"
                 if show_next_button(text=button_text, disabled=False):
-                    st.write("DEBUG: Next/Summary button clicked")
                     self.handle_card_completion("hard", is_correct)
 
     # Initialize and run app
@@ -598,5 +701,9 @@ elif authentication_status:
         # Initialize session state
         initialize_session()
         
-        app = FlashcardApp()
-        app.run()
\ No newline at end of file
+        try:
+            with span('app.rerun'):
+                app = FlashcardApp(db)
+                app.run()
+        finally:
+            export_metrics()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import streamlit as st
+import streamlit_authenticator as stauth
+
+from passwords import HashingBusy, get_password_hasher
+
+class Authenticator(stauth.Authenticate):
+    """
+    Authenticate variant that keeps the credentials mapping it is given.
+    
+    The stock class copies credentials['usernames'] into a new dict on every
+    construction, which would force a lazy mapping to load every user.
+    """
+    
+    def __init__(self, credentials, cookie_name, key, cookie_expiry_days=30.0, **kwargs):
+        super().__init__({'usernames': {}}, cookie_name, key, cookie_expiry_days, **kwargs)
+        self.credentials = credentials
+    
+    def _check_pw(self):
+        # bcrypt runs in the shared worker pool instead of on the script thread
+        try:
+            with st.spinner("Signing in..."):
+                return get_password_hasher().verify(
+                    self.password,
+                    self.credentials['usernames'][self.username]['password'],
+                    username=self.username
+                )
+        except HashingBusy as e:
+            st.error(str(e))
+            raise
@@ -0,0 +1,6 @@
+"""
+Offline benchmarks: UserDB on SQLite and ClaudeService on a fake client.
+
+Run the whole suite from the repository root:
+    python -m benchmarks.run --output results.json
+"""
@@ -0,0 +1,90 @@
+"""
+End-to-end card flow without the UI: generate a deck, answer every card and
+write the results back, the work behind each rerun of a study session.
+
+Run from the repository root:
+    python -m benchmarks.bench_card_flow
+"""
+import time
+
+from benchmarks.bench_database import summarize
+from benchmarks.fakes import FakeClient, seed_users, sqlite_db, username
+from caches import DeckCache, FeedbackCache
+from claude_service import ClaudeService, DeckStream, SingleFlight
+from grading import Grader
+
+ANSWERS = (
+    lambda card: card['answer'],                     # exact: graded locally
+    lambda card: "I don't know",                     # non-answer: graded locally
+    lambda card: f"Something about {card['question']}",  # ambiguous: goes to Claude
+)
+
+def study_session(db, claude, deck_cache, grader, feedback_cache, user, topic, timings):
+    start = time.perf_counter()
+    cards = deck_cache.get(topic, claude.cards_per_session, claude.model)
+    if cards is None:
+        stream = DeckStream(claude.stream_flashcards(topic),
+                            on_complete=lambda deck: deck_cache.put(topic, claude.model, deck)).start()
+        stream.wait_for(1, timeout=30)
+        cards = stream.cards
+    timings['first_card'].append(time.perf_counter() - start)
+
+    results = []
+    for i in range(claude.cards_per_session):
+        if i >= len(cards):
+            stream.wait_for(i + 1, timeout=30)
+        card = cards[i]
+        user_answer = ANSWERS[i % len(ANSWERS)](card)
+
+        start = time.perf_counter()
+        feedback = (grader.grade(card['question'], card['answer'], user_answer)
+                    or feedback_cache.get(card['question'], card['answer'], user_answer))
+        if feedback is None:
+            prompt = {'question': card['question'], 'answer': card['answer'], 'user_answer': user_answer}
+            feedback = claude.create_feedback(prompt)
+            feedback_cache.put(feedback=feedback, **prompt)
+        timings['answer'].append(time.perf_counter() - start)
+        results.append(db.review_params(user, card['question'], card['answer'], feedback['correct'], 'medium'))
+
+    start = time.perf_counter()
+    db.save_flashcard_results(results)
+    timings['save'].append(time.perf_counter() - start)
+
+def run(sessions=30, topics=5, cards=10, latency=0.05, chunk_delay=0.005):
+    """
+    `sessions` sessions spread over `topics` topics, so later sessions hit the
+    deck and feedback caches the way a class studying the same topics would.
+    """
+    db = sqlite_db()
+    seed_users(db, sessions)
+    client = FakeClient(latency=latency, chunk_delay=chunk_delay, cards=cards)
+    claude = ClaudeService(client=client, flights=SingleFlight())
+    claude.cards_per_session = cards
+    # variety=1 lets a pool the size of one deck serve later sessions
+    deck_cache = DeckCache(db, variety=1)
+    grader = Grader()
+    feedback_cache = FeedbackCache(db)
+
+    timings = {'first_card': [], 'answer': [], 'save': []}
+    start = time.perf_counter()
+    for i in range(sessions):
+        study_session(db, claude, deck_cache, grader, feedback_cache, username(i),
+                      f"Topic {i % topics}", timings)
+    elapsed = time.perf_counter() - start
+    db.engine.dispose()
+
+    context = {'sessions': sessions, 'cards': cards, 'llm_latency': latency}
+    return [
+        summarize('flow.time_to_first_card', sorted(timings['first_card']), **context),
+        summarize('flow.answer_latency', sorted(timings['answer']), **context),
+        summarize('flow.save_results', sorted(timings['save']), **context),
+        {'benchmark': 'flow.session', 'seconds': elapsed / sessions,
+         'llm_calls': client.messages.calls, **context},
+    ]
+
+def main():
+    for result in run():
+        print(f"{result['benchmark']:<30} {result['seconds'] * 1e3:>9.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+UserDB benchmarks on SQLite: credential lookups as the user table grows and
+review write throughput.
+
+Run from the repository root:
+    python -m benchmarks.bench_database
+"""
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.fakes import seed_users, sqlite_db, username
+from database import UserDB
+
+def timed_calls(fn, repeat):
+    """Per-call durations in seconds, sorted"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return sorted(durations)
+
+def summarize(name, durations, **extra):
+    return {
+        'benchmark': name,
+        'seconds': durations[len(durations) // 2],
+        'p95_seconds': durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+        'calls': len(durations),
+        **extra
+    }
+
+def bench_credentials(sizes=(10000, 100000, 1000000), lookups=200):
+    """What the authenticator pays per rerun: building credentials and reading one user"""
+    results = []
+    for size in sizes:
+        db = sqlite_db()
+        seed_users(db, size)
+        rng = random.Random(size)
+
+        def login():
+            # Fresh UserDB per rerun, as the app builds it, so nothing is served from memory
+            credentials = UserDB(db.engine).get_user_credentials()['usernames']
+            return credentials[username(rng.randrange(size))]
+
+        def mixed_case_login():
+            credentials = UserDB(db.engine).get_user_credentials()['usernames']
+            return credentials.get(username(rng.randrange(size)).upper())
+
+        results.append(summarize(f'db.get_user_credentials.{size}', timed_calls(
+            lambda: UserDB(db.engine).get_user_credentials(), lookups), users=size))
+        results.append(summarize(f'db.credential_lookup.{size}', timed_calls(login, lookups), users=size))
+        # Misses on the primary key fall back to the lower(username) index
+        results.append(summarize(f'db.credential_lookup_mixed_case.{size}',
+                                 timed_calls(mixed_case_login, max(5, lookups // 20)), users=size))
+        db.engine.dispose()
+    return results
+
+def bench_reviews(cards=2000, batch_size=20):
+    """save_flashcard_result one review at a time, and in the batches the review writer sends"""
+    db = sqlite_db()
+    seed_users(db, 1)
+    user = username(0)
+    params = [UserDB.review_params(user, f"Question {i}?", f"Answer {i}", i % 3 != 0,
+                                   ('easy', 'medium', 'hard')[i % 3]) for i in range(cards)]
+
+    results = []
+    start = time.perf_counter()
+    for i in range(cards):
+        db.save_flashcard_result(user, f"Question {i}?", f"Answer {i}", i % 3 != 0, ('easy', 'medium', 'hard')[i % 3])
+    elapsed = time.perf_counter() - start
+    results.append({'benchmark': 'db.save_flashcard_result.single', 'seconds': elapsed / cards,
+                    'reviews_per_second': cards / elapsed})
+
+    # Second pass updates existing rows, exercising the ON CONFLICT path
+    start = time.perf_counter()
+    for i in range(0, cards, batch_size):
+        db.save_flashcard_results(params[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    results.append({'benchmark': f'db.save_flashcard_results.batch{batch_size}', 'seconds': elapsed / cards,
+                    'reviews_per_second': cards / elapsed})
+
+    results.append(summarize('db.get_due_cards', timed_calls(
+        lambda: db.get_due_cards(user, now=params[-1]['reviewed_at'] + timedelta(days=30)), 100), cards=cards))
+    db.engine.dispose()
+    return results
+
+def run(sizes=(10000, 100000, 1000000)):
+    return bench_credentials(sizes) + bench_reviews()
+
+def main():
+    for result in run():
+        print(f"{result['benchmark']:<50} {result['seconds'] * 1e3:>9.3f} ms")
+
+if __name__ == '__main__':
+    main()
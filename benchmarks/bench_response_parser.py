@@ -0,0 +1,60 @@
+"""
+Micro-benchmarks for response_parser on large and malformed payloads.
+
+Run from the repository root:
+    python -m benchmarks.bench_response_parser
+"""
+import json
+import timeit
+
+from response_parser import extract_json, iter_json_array_items, parse_flashcards
+
+def make_cards(count):
+    return [{"question": f"What is item [{i}] of the {{set}}?",
+             "answer": f"Item {i} is \"number {i}\", of course."} for i in range(count)]
+
+def payloads(count=2000):
+    cards = json.dumps(make_cards(count), separators=(',', ':'))
+    trailing = cards.replace('"},', '",},').replace('"}]', '",},]')
+    asides = " ".join(f"[note {i}]" for i in range(200))
+    return {
+        'clean': cards,
+        'fenced_prose': "Here are your flashcards:\n```json\n" + cards + "\n```\nLet me know if you want more!",
+        'trailing_commas': trailing,
+        'bracketed_asides': asides + " " + cards,
+    }
+
+def measure(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number
+
+def run(count=2000, number=20):
+    """Return one result dict per (parser, payload) pair"""
+    results = []
+    for name, text in payloads(count).items():
+        cases = {
+            'extract_json': lambda: extract_json(text),
+            'parse_flashcards': lambda: parse_flashcards(text),
+            'stream_1k_chunks': lambda: list(iter_json_array_items(
+                text[i:i + 1024] for i in range(0, len(text), 1024))),
+        }
+        if name == 'clean':
+            # Lower bound: the C decoder on input that needs no cleanup
+            cases['json.loads'] = lambda: json.loads(text)
+        for parser, fn in cases.items():
+            seconds = measure(fn, number)
+            results.append({
+                'benchmark': f'parse.{parser}.{name}',
+                'payload_bytes': len(text),
+                'seconds': seconds,
+                'mb_per_second': len(text) / seconds / 1e6,
+            })
+    return results
+
+def main():
+    for result in run():
+        print(f"{result['benchmark']:<45} {result['payload_bytes']:>9,} B "
+              f"{result['seconds'] * 1e3:>9.2f} ms {result['mb_per_second']:>8.1f} MB/s")
+
+if __name__ == '__main__':
+    main()
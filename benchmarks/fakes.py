@@ -0,0 +1,107 @@
+"""Stand-ins for Postgres and the Anthropic API, so benchmarks run offline"""
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import bcrypt
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from database import User, UserDB, init_schema
+from scheduling import Leitner
+
+# Hashed once: seeding a million users must not pay bcrypt per row
+PASSWORD = "benchmark-password"
+PASSWORD_HASH = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+
+def sqlite_db(path=None, scheduler=None):
+    """UserDB on a fresh SQLite database, in memory unless a file path is given"""
+    if path:
+        # Concurrent sessions wait for SQLite's single writer instead of failing
+        engine = create_engine(f"sqlite:///{path}", connect_args={'timeout': 30})
+    else:
+        # One shared connection so every session sees the same in-memory database
+        engine = create_engine("sqlite://", poolclass=StaticPool,
+                               connect_args={'check_same_thread': False})
+    init_schema(engine)
+    # Explicit scheduler: there are no secrets to read it from outside Streamlit
+    return UserDB(engine, scheduler or Leitner())
+
+def username(i):
+    return f"user{i:07d}"
+
+def seed_users(db, count, chunk_size=20000):
+    users = User.__table__
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        for start in range(0, count, chunk_size):
+            conn.execute(users.insert(), [
+                {'username': username(i), 'email': f"{username(i)}@example.com",
+                 'name': f"User {i}", 'password': PASSWORD_HASH, 'created_at': now}
+                for i in range(start, min(start + chunk_size, count))
+            ])
+
+def fake_cards(topic, count):
+    return [{"question": f"What is fact {i} about {topic}?",
+             "answer": f"Fact {i} about {topic} is that it is fact number {i}."} for i in range(count)]
+
+class FakeText:
+    def __init__(self, text):
+        self.text = text
+
+class FakeMessage:
+    def __init__(self, text):
+        self.content = [FakeText(text)]
+
+class FakeStream:
+    def __init__(self, chunks, delay):
+        self._chunks = chunks
+        self._delay = delay
+
+    @property
+    def text_stream(self):
+        for chunk in self._chunks:
+            time.sleep(self._delay)
+            yield chunk
+
+class FakeMessages:
+    """
+    Deterministic messages API. Every request waits `latency` seconds before
+    its first token; streamed decks then arrive one card per `chunk_delay`.
+    """
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, cards=10):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.cards = cards
+        self.calls = 0
+
+    def _respond(self, kwargs):
+        self.calls += 1
+        prompt = kwargs['messages'][0]['content']
+        if "flashcards about" in prompt:
+            topic = prompt.split("flashcards about", 1)[1].split(".", 1)[0].strip()
+            return json.dumps(fake_cards(topic, self.cards), separators=(',', ':'))
+        if "Item 0:" in prompt:
+            items = prompt.count("\nUser answer:")
+            return json.dumps([{"index": i, "correct": i % 2 == 0, "explanation": "Batch verdict."}
+                               for i in range(items)])
+        return json.dumps({"correct": True, "explanation": "The main concept is there."})
+
+    def create(self, **kwargs):
+        time.sleep(self.latency)
+        return FakeMessage(self._respond(kwargs))
+
+    @contextmanager
+    def stream(self, **kwargs):
+        time.sleep(self.latency)
+        text = self._respond(kwargs)
+        # Split after each card so the parser sees realistic boundaries
+        chunks = [part + "}," for part in text.split("},")]
+        chunks[-1] = chunks[-1][:-2]
+        yield FakeStream(chunks, self.chunk_delay)
+
+class FakeClient:
+    def __init__(self, latency=0.0, chunk_delay=0.0, cards=10):
+        self.messages = FakeMessages(latency, chunk_delay, cards)
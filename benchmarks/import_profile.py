@@ -0,0 +1,91 @@
+"""
+Cold-start profile of the login page.
+
+Runs app.py once with AppTest in a fresh interpreter under -X importtime,
+signed out and against an in-memory SQLite database, then reports the wall
+time of that first run and the import time of each top-level package.
+
+Run from the repository root:
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in the child interpreter; prints the first run's wall time last
+LOGIN_PAGE = """
+import time
+start = time.perf_counter()
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from streamlit.testing.v1 import AppTest
+import database
+
+engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={'check_same_thread': False})
+database.init_schema(engine)
+database.get_engine = lambda: engine
+at = AppTest.from_file(%(app)r, default_timeout=60)
+at.secrets['cookie_key'] = "import-profile-cookie-key"
+at.run()
+assert not at.exception, at.exception
+print("first_run_seconds", time.perf_counter() - start)
+"""
+
+# Modules the login page should not need. Streamlit itself still loads
+# pandas when the authenticator's cookie component checks its arguments.
+HEAVY = ('numpy', 'pandas', 'anthropic', 'httpx')
+
+def parse_importtime(stderr):
+    """{top-level package: cumulative seconds} from -X importtime output"""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header row
+        module = name.rstrip()
+        # Nesting is shown by indentation; top-level imports have one leading space
+        if module.startswith("  "):
+            continue
+        root = module.strip().split(".")[0]
+        packages[root] = packages.get(root, 0.0) + int(cumulative) / 1e6
+    return packages
+
+def profile():
+    script = LOGIN_PAGE % {'app': os.path.join(ROOT, 'app.py')}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    first_run = next(float(line.split()[1]) for line in result.stdout.splitlines()
+                     if line.startswith("first_run_seconds"))
+    packages = parse_importtime(result.stderr)
+    return {
+        'first_run_seconds': first_run,
+        'import_seconds': sum(packages.values()),
+        'heavy_modules_loaded': [name for name in HEAVY if name in packages],
+        'packages': dict(sorted(packages.items(), key=lambda item: item[1], reverse=True))
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    parser.add_argument('--top', type=int, default=20, help="packages to list")
+    args = parser.parse_args(argv)
+
+    report = profile()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"First run of the login page: {report['first_run_seconds'] * 1e3:.0f} ms "
+          f"({report['import_seconds'] * 1e3:.0f} ms in imports)")
+    print(f"Heavy modules loaded: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    for name, seconds in list(report['packages'].items())[:args.top]:
+        print(f"{name:<35} {seconds * 1e3:>9.1f} ms")
+
+if __name__ == '__main__':
+    main()
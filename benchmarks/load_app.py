@@ -0,0 +1,237 @@
+"""
+Load test that drives the real app.py with Streamlit's AppTest.
+
+Each simulated learner logs in, generates a deck from one of the preset
+topics, answers every card (right, "I don't know" or a paraphrase that needs
+Claude) and rates it, until the session summary appears. Learners run
+on their own threads in one process against a file-backed SQLite database
+and the fake Claude client, sharing cached resources the way real sessions
+do. AppTest patches process globals around each run, so reruns from
+different learners take turns; deck streaming, prefetching and review
+writes still overlap with them in the background.
+
+Run from the repository root:
+    python -m benchmarks.load_app --users 20 --cards 5 --output load.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+from sqlalchemy import event
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test
+
+import api_client
+import claude_service
+import database
+from benchmarks.fakes import PASSWORD, FakeClient, seed_users, sqlite_db, username
+from perf import quantile
+from review_writer import get_review_writer
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+RATINGS = ("😊 Easy", "😐 Medium", "😓 Hard")
+DONE_LABEL = "🔄 Start New Session"
+
+class ConnectionStats:
+    """Counts pool connections opened and the peak number checked out at once"""
+
+    def __init__(self, engine):
+        self.pool = engine.pool
+        self.opened = 0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+
+    def _on_connect(self, *args):
+        with self._lock:
+            self.opened += 1
+
+    def _on_checkout(self, *args):
+        with self._lock:
+            self.peak_checked_out = max(self.peak_checked_out, self.pool.checkedout())
+
+def rss_bytes():
+    """Resident set size of this process (Linux), or 0 where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+@contextmanager
+def shared_script_cache(script_path=APP_PATH):
+    """Compile app.py once for every learner, as the real server does, instead of once per rerun"""
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(script_path)
+    app_test.ScriptCache = lambda: script_cache
+    try:
+        yield
+    finally:
+        app_test.ScriptCache = ScriptCache
+
+@contextmanager
+def stand_in_backends(db, client):
+    """Point the app's process-wide engine and Claude client at the stand-ins"""
+    saved = database.get_engine, api_client.get_anthropic_client, claude_service.get_anthropic_client
+    database.get_engine = lambda: db.engine
+    api_client.get_anthropic_client = claude_service.get_anthropic_client = lambda: client
+    try:
+        yield
+    finally:
+        database.get_engine, api_client.get_anthropic_client, claude_service.get_anthropic_client = saved
+
+class Learner:
+    # AppTest swaps st.secrets and a mock Runtime in and out around each run,
+    # so reruns from different learners cannot overlap; they interleave instead
+    rerun_lock = threading.Lock()
+
+    def __init__(self, index, cards, timeout):
+        self.index = index
+        self.cards = cards
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.at.secrets['cookie_key'] = "load-test-cookie-key-0123456789abcdef"
+        self.at.secrets['anthropic_api_key'] = "unused"
+        self.reruns = []
+        self.latencies = []
+        self.error = None
+        self.completed = False
+
+    def step(self, element=None):
+        """Run one rerun, triggered by an interaction or the initial page load"""
+        queued = time.perf_counter()
+        with self.rerun_lock:
+            start = time.perf_counter()
+            (element.run() if element is not None else self.at.run())
+            finished = time.perf_counter()
+        self.reruns.append(finished - start)
+        self.latencies.append(finished - queued)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def button(self, label):
+        matches = [b for b in self.at.button if label in b.label]
+        return matches[0] if matches else None
+
+    def answer(self, card_number):
+        card = self.at.session_state['current_cards'][self.at.session_state['current_index']]
+        style = card_number % 3
+        if style == 0:
+            return card['answer']
+        if style == 1:
+            return "I don't know"
+        return f"Something about {card['question']}"
+
+    def run(self):
+        try:
+            at = self.at
+            self.step()
+            at.text_input[0].input(username(self.index))
+            at.text_input[1].input(PASSWORD)
+            self.step(self.button("Login").click())
+
+            topics = [b for b in at.button if '\n' in b.label]
+            self.step(topics[self.index % len(topics)].click())
+
+            card_number = 0
+            while self.button(DONE_LABEL) is None:
+                if any(area.key == 'answer_input' for area in at.text_area):
+                    at.text_area(key='answer_input').input(self.answer(card_number))
+                    self.step(self.button("Check Answer").click())
+                    continue
+                rating = self.button(RATINGS[card_number % len(RATINGS)])
+                next_button = self.button("Next Card") or self.button("Show Summary")
+                if rating is None and next_button is None:
+                    raise RuntimeError(f"No way forward from the page with buttons {[b.label for b in at.button]}")
+                self.step((rating or next_button).click())
+                card_number += 1
+                if card_number > self.cards * 2:
+                    raise RuntimeError("Session did not finish")
+            self.completed = True
+        except Exception as e:
+            self.error = e
+
+def run(users=10, cards=5, llm_latency=0.2, chunk_delay=0.02, timeout=60):
+    # Process-wide resources (review writer, feedback cache) left over from
+    # earlier runs in this process would still point at their databases
+    st.cache_resource.clear()
+    with tempfile.TemporaryDirectory(prefix="memapp-load-") as directory:
+        try:
+            return _run(directory, users, cards, llm_latency, chunk_delay, timeout)
+        finally:
+            st.cache_resource.clear()
+
+def _run(directory, users, cards, llm_latency, chunk_delay, timeout):
+    db = sqlite_db(os.path.join(directory, "load.db"))
+    seed_users(db, users)
+    connections = ConnectionStats(db.engine)
+    fake = FakeClient(latency=llm_latency, chunk_delay=chunk_delay, cards=cards)
+    client = api_client.LimitedClient(fake)
+
+    learners = [Learner(i, cards, timeout) for i in range(users)]
+    for learner in learners:
+        learner.at.session_state['config'] = {'flashcards_per_session': cards}
+
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    with stand_in_backends(db, client), shared_script_cache():
+        threads = [threading.Thread(target=learner.run, name=f"learner-{learner.index}") for learner in learners]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    reruns = sorted(seconds for learner in learners for seconds in learner.reruns)
+    latencies = sorted(seconds for learner in learners for seconds in learner.latencies)
+    completed = sum(learner.completed for learner in learners)
+    if completed:
+        # Drain the shared review writer while its database still exists
+        get_review_writer().close()
+    db.engine.dispose()
+    return {
+        'users': users,
+        'cards': cards,
+        'llm_latency': llm_latency,
+        'completed_sessions': completed,
+        'errors': [f"learner {learner.index}: {learner.error}" for learner in learners if learner.error],
+        'elapsed_seconds': elapsed,
+        'sessions_per_second': completed / elapsed,
+        'reruns': len(reruns),
+        'reruns_per_second': len(reruns) / elapsed,
+        # Time the script itself ran, and what the learner waited including the queue
+        'rerun_p50_ms': 1000 * quantile(reruns, 0.5) if reruns else None,
+        'rerun_p95_ms': 1000 * quantile(reruns, 0.95) if reruns else None,
+        'rerun_max_ms': 1000 * reruns[-1] if reruns else None,
+        'latency_p50_ms': 1000 * quantile(latencies, 0.5) if latencies else None,
+        'latency_p95_ms': 1000 * quantile(latencies, 0.95) if latencies else None,
+        'db_connections_opened': connections.opened,
+        'db_peak_checked_out': connections.peak_checked_out,
+        'llm_requests': fake.messages.calls,
+        'llm_queue': client.stats.snapshot(),
+        'rss_per_session_bytes': max(0, rss_after - rss_before) // max(1, users),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10, help="concurrent learners")
+    parser.add_argument('--cards', type=int, default=5, help="cards per deck")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="fake API time to first token, seconds")
+    parser.add_argument('--output', help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    report = run(users=args.users, cards=args.cards, llm_latency=args.llm_latency)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 1 if report['errors'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,86 @@
+"""
+Run the benchmark suite and write machine-readable results.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --quick --compare baseline.json
+
+With --compare, each benchmark's median is checked against the baseline and
+the exit status is 1 if any got slower by more than --threshold.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+import sqlalchemy
+
+from benchmarks import bench_card_flow, bench_database, bench_response_parser
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(quick=False):
+    sizes = (10000,) if quick else (10000, 100000, 1000000)
+    results = []
+    results += bench_database.run(sizes=sizes)
+    results += bench_response_parser.run(count=500 if quick else 2000, number=5 if quick else 20)
+    results += bench_card_flow.run(sessions=10 if quick else 30)
+    return {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'quick': quick,
+        'results': results
+    }
+
+def compare(baseline, current, threshold=0.2):
+    """Return (rows, regressions): one row per benchmark present in both runs"""
+    before = {result['benchmark']: result['seconds'] for result in baseline['results']}
+    rows, regressions = [], []
+    for result in current['results']:
+        name = result['benchmark']
+        if name not in before or not before[name]:
+            continue
+        ratio = result['seconds'] / before[name]
+        rows.append((name, before[name], result['seconds'], ratio))
+        if ratio > 1 + threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="slowdown ratio counted as a regression (default 0.2 = 20%%)")
+    parser.add_argument('--quick', action='store_true', help="small sizes only, for a fast check")
+    args = parser.parse_args(argv)
+
+    current = run_suite(quick=args.quick)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+    for result in current['results']:
+        print(f"{result['benchmark']:<50} {result['seconds'] * 1e3:>10.3f} ms")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, current, args.threshold)
+        print(f"\nCompared with {baseline.get('commit') or args.compare}:")
+        for name, before, after, ratio in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<50} {before * 1e3:>10.3f} -> {after * 1e3:>10.3f} ms  x{ratio:.2f}{flag}")
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
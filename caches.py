@@ -0,0 +1,226 @@
+import hashlib
+import json
+import random
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import streamlit as st
+from sqlalchemy import select
+
+from database import UserDB, DeckCacheEntry, FeedbackCacheEntry, dialect_insert, question_hash
+from grading import CACHED
+from perf import timed
+
+def normalize_topic(topic):
+    return " ".join(str(topic).split()).lower()
+
+def evict_entries(engine, table, ttl, max_entries):
+    """Drop entries older than ttl and the least recently used beyond max_entries"""
+    with engine.begin() as conn:
+        conn.execute(table.delete().where(table.c.created_at <= datetime.utcnow() - ttl))
+        stale = select(table.c.cache_key).order_by(table.c.last_used_at.desc()).offset(max_entries)
+        conn.execute(table.delete().where(table.c.cache_key.in_(stale)))
+
+class DeckCache:
+    """
+    Database-backed cache of generated decks, shared across sessions and processes.
+
+    Entries hold a pool of cards per (normalized topic, model). A lookup for
+    `count` cards is served as a random subset of the pool once the pool holds
+    at least `count * variety` cards, so repeat requests see varied decks;
+    smaller pools miss and grow from the next generated deck. Entries expire
+    `ttl` after creation and the least recently used are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(self, db, ttl=timedelta(days=7), max_entries=1000, max_pool=50, variety=2):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_pool = max_pool
+        self.variety = variety
+
+    @staticmethod
+    def key(topic, model):
+        return hashlib.sha256(f"{normalize_topic(topic)}\n{model}".encode('utf-8')).hexdigest()
+
+    @timed('deck_cache.get')
+    def get(self, topic, count, model):
+        """Return `count` cached cards for the topic, or None on a miss"""
+        now = datetime.utcnow()
+        table = DeckCacheEntry.__table__
+        # Touch and read the entry in one round trip
+        statement = table.update().where(
+            table.c.cache_key == self.key(topic, model),
+            table.c.created_at > now - self.ttl
+        ).values(
+            hits=table.c.hits + 1,
+            last_used_at=now
+        ).returning(table.c.cards)
+
+        with self.db.engine.begin() as conn:
+            cards = conn.execute(statement).scalar()
+        if cards is None:
+            return None
+        pool = json.loads(cards)
+        if len(pool) < count * self.variety:
+            return None
+        return random.sample(pool, count)
+
+    @timed('deck_cache.put')
+    def put(self, topic, model, cards):
+        """Merge freshly generated cards into the topic's pool"""
+        now = datetime.utcnow()
+        table = DeckCacheEntry.__table__
+        key = self.key(topic, model)
+
+        with self.db.engine.begin() as conn:
+            row = conn.execute(
+                select(table.c.cards).where(table.c.cache_key == key, table.c.created_at > now - self.ttl)
+            ).first()
+            pool = json.loads(row.cards) if row else []
+
+            seen = {question_hash(card['question']) for card in pool}
+            for card in cards:
+                card_hash = question_hash(card['question'])
+                if card_hash not in seen:
+                    seen.add(card_hash)
+                    pool.append({'question': card['question'], 'answer': card['answer']})
+            pool = pool[-self.max_pool:]
+
+            statement = dialect_insert(self.db.engine)(table).values(
+                cache_key=key,
+                topic=normalize_topic(topic),
+                model=model,
+                cards=json.dumps(pool),
+                hits=0,
+                created_at=now,
+                last_used_at=now
+            )
+            # An expired entry starts over with a fresh creation time
+            conn.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.cache_key],
+                set_={
+                    'cards': statement.excluded.cards,
+                    'last_used_at': now,
+                    'created_at': table.c.created_at if row else now
+                }
+            ))
+        self.evict()
+
+    def evict(self):
+        evict_entries(self.db.engine, DeckCacheEntry.__table__, self.ttl, self.max_entries)
+
+class LRUCache:
+    """Small thread-safe in-process LRU mapping"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+class FeedbackCache:
+    """
+    Two-level cache of Claude's feedback for repeated (question, answer, user answer) triples.
+
+    An in-process LRU sits in front of the shared feedback_cache table. Table
+    entries expire `ttl` after creation; eviction of expired and least
+    recently used rows runs every `evict_every` writes to keep it off the
+    common path.
+    """
+
+    def __init__(self, db, memory_size=5000, ttl=timedelta(days=30), max_entries=500000, evict_every=200):
+        self.db = db
+        self.memory = LRUCache(memory_size)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    @staticmethod
+    def key(question, answer, user_answer):
+        # Only case and whitespace are folded: "-40" and "40", or "C" and "C++", are different answers
+        triple = "\n".join(" ".join(str(part or "").split()).casefold() for part in (question, answer, user_answer))
+        return hashlib.sha256(triple.encode('utf-8')).hexdigest()
+
+    @timed('feedback_cache.get')
+    def get(self, question, answer, user_answer):
+        """Return the cached {"correct", "explanation", "tier"} feedback, or None"""
+        key = self.key(question, answer, user_answer)
+        feedback = self.memory.get(key)
+        if feedback is not None:
+            return {**feedback, 'tier': CACHED}
+
+        now = datetime.utcnow()
+        table = FeedbackCacheEntry.__table__
+        statement = table.update().where(
+            table.c.cache_key == key,
+            table.c.created_at > now - self.ttl
+        ).values(last_used_at=now).returning(table.c.correct, table.c.explanation)
+        with self.db.engine.begin() as conn:
+            row = conn.execute(statement).first()
+        if row is None:
+            return None
+
+        feedback = {'correct': bool(row.correct), 'explanation': row.explanation}
+        self.memory.put(key, feedback)
+        return {**feedback, 'tier': CACHED}
+
+    @timed('feedback_cache.put')
+    def put(self, question, answer, user_answer, feedback):
+        key = self.key(question, answer, user_answer)
+        feedback = {'correct': bool(feedback['correct']), 'explanation': feedback['explanation']}
+        self.memory.put(key, feedback)
+
+        now = datetime.utcnow()
+        table = FeedbackCacheEntry.__table__
+        statement = dialect_insert(self.db.engine)(table).values(
+            cache_key=key,
+            created_at=now,
+            last_used_at=now,
+            **feedback
+        )
+        with self.db.engine.begin() as conn:
+            conn.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.cache_key],
+                set_={
+                    'correct': statement.excluded.correct,
+                    'explanation': statement.excluded.explanation,
+                    'created_at': now,
+                    'last_used_at': now
+                }
+            ))
+
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        evict_entries(self.db.engine, FeedbackCacheEntry.__table__, self.ttl, self.max_entries)
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_cache():
+    # Process-wide so the in-memory layer is shared by every session
+    return FeedbackCache(UserDB())
@@ -1,11 +1,140 @@
-from anthropic import Anthropic
 import streamlit as st
-import re
-import json
+import logging
+import threading
+from functools import partial
+
+from api_client import get_anthropic_client
+from caches import normalize_topic
+from perf import timed
+from response_parser import ResponseParseError, is_card, iter_json_array_items, parse_feedback, response_text
+
+logger = logging.getLogger(__name__)
+
+class Flight:
+    """One in-flight upstream request and everything it has produced so far"""
+
+    def __init__(self):
+        self.items = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.condition = threading.Condition()
+
+    def add(self, item):
+        with self.condition:
+            self.items.append(item)
+            self.condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.condition:
+            self.result, self.error, self.done = result, error, True
+            self.condition.notify_all()
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests into one upstream call.
+
+    The first caller for a key runs the request; callers arriving while it is
+    in flight wait for and share its result, or its exception. Followers give
+    up with TimeoutError after `timeout` seconds without progress; the leader
+    is unaffected. A key is forgotten as soon as its request finishes, so
+    later calls start a fresh request.
+    """
 
-class ClaudeService:
     def __init__(self):
-        self.client = Anthropic(api_key=st.secrets["anthropic_api_key"])
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _join(self, key):
+        """Return (flight, is_leader)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.calls += 1
+            return flight, True
+
+    def _land(self, key, flight, result=None, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(result, error)
+
+    def do(self, key, fn, timeout=None):
+        flight, leader = self._join(key)
+        if leader:
+            try:
+                result = fn()
+            except Exception as e:
+                self._land(key, flight, error=e)
+                raise
+            except BaseException:
+                self._land(key, flight, error=RuntimeError("Shared request was interrupted"))
+                raise
+            self._land(key, flight, result=result)
+            return result
+
+        with flight.condition:
+            if not flight.condition.wait_for(lambda: flight.done, timeout):
+                raise TimeoutError(f"Timed out waiting for shared request {key!r}")
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key, iterator_fn, timeout=None):
+        """Like do() for a generator: followers receive every item the leader yields"""
+        flight, leader = self._join(key)
+        if leader:
+            yield from self._lead(key, flight, iterator_fn)
+        else:
+            yield from self._follow(key, flight, timeout)
+
+    def _lead(self, key, flight, iterator_fn):
+        error = None
+        try:
+            for item in iterator_fn():
+                flight.add(item)
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # A leader that stops reading early ends the stream for its followers too
+            self._land(key, flight, error=error)
+
+    def _follow(self, key, flight, timeout):
+        position = 0
+        while True:
+            with flight.condition:
+                if not flight.condition.wait_for(lambda: len(flight.items) > position or flight.done, timeout):
+                    raise TimeoutError(f"Timed out waiting for shared request {key!r}")
+                items = flight.items[position:]
+                finished = flight.done and position + len(items) == len(flight.items)
+            position += len(items)
+            yield from items
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    # Process-wide so identical requests from different sessions coalesce
+    return SingleFlight()
+
+class ClaudeService:
+    MODEL = "claude-3-sonnet-20240229"
+    # Longest a coalesced caller waits on someone else's request without progress
+    FLIGHT_TIMEOUT = 120
+    
+    def __init__(self, client=None, flights=None):
+        self.client = client if client is not None else get_anthropic_client()
+        self.flights = flights if flights is not None else get_single_flight()
+        self.model = self.MODEL
         # Get config or use default
         self.cards_per_session = st.session_state.get('config', {}).get('flashcards_per_session', 2)
         if st.session_state.get('debug_mode', False):
@@ -13,11 +142,10 @@ class ClaudeService:
     
     def extract_claude_content(self, response):
         """Helper method to extract text content from Claude API response"""
-        if hasattr(response, 'content') and hasattr(response.content[0], 'text'):
-            return response.content[0].text
-        return str(response)
+        return response_text(response)
 
-    def create_flashcards(self, topic):
+    def flashcard_request(self, topic):
+        """Keyword arguments for the messages API call that generates a deck"""
         # Create example cards based on count
         example_cards = [
             '{{"question":"What is X?","answer":"X is Y"}}',
@@ -42,8 +170,8 @@ class ClaudeService:
         - Answers are complete sentences
         """
         
-        message = self.client.messages.create(
-            model="claude-3-sonnet-20240229",
+        return dict(
+            model=self.model,
             max_tokens=1000,
             temperature=0.7,
             system="You are a JSON generator. ONLY output valid, minified JSON arrays.",
@@ -52,9 +180,25 @@ class ClaudeService:
                 "content": prompt
             }]
         )
-        
-        return self.extract_claude_content(message)
 
+    def deck_key(self, kind, topic):
+        """Identical deck requests in flight at once share one API call"""
+        return (kind, normalize_topic(topic), self.cards_per_session, self.model)
+
+    def stream_flashcards(self, topic, kind='stream'):
+        """
+        Yield each {question, answer} card as soon as it has streamed in.
+        Prefetches pass their own `kind` so they never join the deck being studied.
+        """
+        return self.flights.stream(self.deck_key(kind, topic), partial(self._stream_flashcards, topic),
+                                   timeout=self.FLIGHT_TIMEOUT)
+
+    @timed('claude.stream_flashcards')
+    def _stream_flashcards(self, topic):
+        with self.client.messages.stream(**self.flashcard_request(topic)) as stream:
+            yield from iter_json_array_items(stream.text_stream)
+
+    @timed('claude.create_feedback')
     def create_feedback(self, prompt):
         evaluation_prompt = f"""Evaluate this flashcard answer by completing this JSON template - do NOT modify the structure, only replace the values:
 
@@ -78,7 +222,7 @@ class ClaudeService:
         
         try:
             response = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
+                model=self.model,
                 max_tokens=150,
                 temperature=0.1,
                 system="You are a JSON template filler. Keep all quotes and braces, only replace the values inside the quotes.",
@@ -93,17 +237,101 @@ class ClaudeService:
             if st.session_state.get('debug_mode', False):
                 st.write("DEBUG: Claude raw response:", content)
             
-            # Simple JSON parsing - the response should be a clean JSON object
+            # Returns a validated {"correct", "explanation"} dict
             try:
-                result = json.loads(str(content).strip())
-                result['correct'] = bool(result.get('correct', False))
-                return json.dumps(result)
-            except json.JSONDecodeError as e:
+                return parse_feedback(content)
+            except ResponseParseError as e:
                 if st.session_state.get('debug_mode', False):
                     st.write("DEBUG: JSON parse error:", str(e))
-                raise ValueError("Response was not valid JSON - missing quotes or braces")
+                raise
             
         except Exception as e:
             if st.session_state.get('debug_mode', False):
                 st.write("DEBUG: Error in create_feedback:", str(e))
-            raise
\ No newline at end of file
+            raise
+
+    @timed('claude.create_batch_feedback')
+    def create_batch_feedback(self, items):
+        """Grade a whole session in one request; items are {question, answer, user_answer} dicts"""
+        numbered = "\n\n".join(
+            f"Item {i}:\nQuestion: {item['question']}\nCorrect answer: {item['answer']}\nUser answer: {item['user_answer']}"
+            for i, item in enumerate(items)
+        )
+        evaluation_prompt = f"""Evaluate each of these {len(items)} flashcard answers.
+
+        {numbered}
+
+        Respond with ONLY a JSON array with one object per item, in item order:
+        [{{"index":0,"correct":true,"explanation":"..."}}]
+
+        Rules:
+        1. "index" is the item number
+        2. Set "correct" to true if main concepts are understood
+        3. Set "correct" to false if key concepts are missing
+        4. Keep each explanation to one or two sentences
+        5. No comments or extra text - ONLY the JSON array
+        """
+        
+        response = self.client.messages.create(
+            model=self.model,
+            max_tokens=min(4000, 150 * len(items) + 100),
+            temperature=0.1,
+            system="You are a JSON generator. ONLY output valid, minified JSON arrays.",
+            messages=[{
+                "role": "user",
+                "content": evaluation_prompt
+            }]
+        )
+        return self.extract_claude_content(response)
+
+class DeckStream:
+    """
+    Consumes a card generator on a background thread.
+
+    `cards` is a list that grows as cards arrive, so a study session can start
+    on the first card while the rest of the deck is still being generated.
+    """
+    
+    def __init__(self, card_iterator, on_complete=None):
+        self.cards = []
+        self.done = False
+        self.error = None
+        self._card_iterator = card_iterator
+        self._on_complete = on_complete
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="deck-stream", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+        return self
+    
+    def _run(self):
+        try:
+            for card in self._card_iterator:
+                if not is_card(card):
+                    continue
+                with self._condition:
+                    self.cards.append(card)
+                    self._condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._condition:
+                self.done = True
+                self._condition.notify_all()
+        
+        if self._on_complete and self.cards and self.error is None:
+            try:
+                self._on_complete(list(self.cards))
+            except Exception:
+                logger.exception("Deck stream completion callback failed")
+    
+    def wait_for(self, count, timeout=None):
+        """Block until `count` cards have arrived or the stream ends; returns the number available"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.cards) >= count or self.done, timeout)
+            return len(self.cards)
+    
+    def join(self, timeout=None):
+        """Wait for the stream and its completion callback to finish"""
+        self._thread.join(timeout)
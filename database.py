@@ -1,9 +1,16 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Boolean, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import (create_engine, func, inspect, select, bindparam, text, Column, String, Text,
+                        Date, DateTime, Integer, BigInteger, Float, Boolean, Interval, ForeignKey, Index)
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from sqlalchemy.schema import CreateIndex
 import streamlit as st
-import streamlit_authenticator as stauth
-from datetime import datetime, timedelta
+import csv
+import hashlib
+import io
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime
+from passwords import get_password_hasher
+from perf import timed
 
 # Create base class for declarative models
 Base = declarative_base()
@@ -19,76 +26,339 @@ class User(Base):
     
     flashcards = relationship("Flashcard", back_populates="user")
 
+# Serves the case-insensitive login lookup; the authenticator lowercases what users type
+Index('ix_users_username_lower', func.lower(User.username))
+
+def normalize_question(question):
+    """Case- and whitespace-insensitive form of a question, used for card identity"""
+    return " ".join(str(question).split()).lower()
+
+def question_hash(question):
+    return hashlib.sha256(normalize_question(question).encode('utf-8')).hexdigest()
+
 class Flashcard(Base):
     __tablename__ = 'flashcards'
+    __table_args__ = (
+        # One card per user and normalized question; also the upsert conflict target
+        Index('uq_flashcards_user_question', 'user_id', 'question_hash', unique=True),
+        # Serves the due-card review queue
+        Index('ix_flashcards_user_next_review', 'user_id', 'next_review'),
+        # Covers the per-box card counts on the progress dashboard
+        Index('ix_flashcards_user_box', 'user_id', 'box_number'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(String, ForeignKey('users.username'))
     question = Column(String)
+    question_hash = Column(String(64), nullable=False)  # sha256 of normalize_question()
     answer = Column(String)
+    topic = Column(String)  # topic the card was generated for
     box_number = Column(Integer, default=1)  # Leitner box number (1-5)
+    ease_factor = Column(Float, default=2.5)  # SM-2 ease
+    interval_days = Column(Float)  # interval assigned at the last review
+    repetitions = Column(Integer, default=0)  # consecutive correct answers
     next_review = Column(DateTime)
+    last_reviewed_at = Column(DateTime)
     last_difficulty = Column(String)  # easy, medium, hard
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="flashcards")
 
-class UserDB:
-    def __init__(self):
-        # Create PostgreSQL connection URL from secrets
-        conn_str = (f"postgresql://{st.secrets['postgres']['user']}:"
-                   f"{st.secrets['postgres']['password']}@"
-                   f"{st.secrets['postgres']['host']}:"
-                   f"{st.secrets['postgres']['port']}/"
-                   f"{st.secrets['postgres']['database']}")
+class DailyStats(Base):
+    """Review counts per user, day and topic, kept up to date as reviews are saved"""
+    __tablename__ = 'daily_stats'
+    
+    user_id = Column(String, ForeignKey('users.username'), primary_key=True)
+    day = Column(Date, primary_key=True)  # UTC
+    topic = Column(String, primary_key=True, default='')  # '' for cards without a topic
+    reviews = Column(Integer, default=0)
+    correct = Column(Integer, default=0)
+
+class Review(Base):
+    """Append-only log of every answered card, for schedulers and analytics"""
+    __tablename__ = 'reviews'
+    __table_args__ = (
+        # Rows arrive in time order, so a block-range index stays tiny and
+        # serves time-range scans and retention deletes
+        Index('ix_reviews_reviewed_at', 'reviewed_at', postgresql_using='brin'),
+        Index('ix_reviews_user_reviewed_at', 'user_id', 'reviewed_at'),
+    )
+    
+    # No foreign keys: inserts stay cheap and old rows can be pruned independently
+    id = Column(BigInteger().with_variant(Integer, 'sqlite'), primary_key=True)
+    user_id = Column(String, nullable=False)
+    question_hash = Column(String(64), nullable=False)  # identifies the card with user_id
+    reviewed_at = Column(DateTime, nullable=False)
+    correct = Column(Boolean)
+    difficulty = Column(String)  # easy, medium, hard
+    latency_ms = Column(Integer)  # from showing the card to submitting the answer
+    grader_tier = Column(String)  # exact, similarity, cache or llm
+
+class DeckCacheEntry(Base):
+    """Pool of generated cards shared by everyone who asks for the same topic and model"""
+    __tablename__ = 'deck_cache'
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 of normalized topic and model
+    topic = Column(String)
+    model = Column(String)
+    cards = Column(Text)  # JSON array of {question, answer}
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class FeedbackCacheEntry(Base):
+    """Claude's verdict for a (question, answer, user answer) triple"""
+    __tablename__ = 'feedback_cache'
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 of the normalized triple
+    correct = Column(Boolean)
+    explanation = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+def dialect_insert(engine):
+    """Return the dialect's insert() construct, which supports ON CONFLICT"""
+    if engine.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+def copy_rows(conn, table, rows):
+    """Bulk-load dicts into table: COPY on Postgres, a multi-row INSERT elsewhere"""
+    if not rows:
+        return
+    if conn.dialect.name != 'postgresql':
+        conn.execute(table.insert(), rows)
+        return
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    # None becomes an empty unquoted field, which CSV COPY reads as NULL
+    csv.writer(buffer).writerows([row[column] for column in columns] for row in rows)
+    buffer.seek(0)
+    # The DBAPI cursor belongs to this transaction, so the COPY commits with it
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def days_after(engine, timestamp, days):
+    """SQL expression for a timestamp moved by `days`, a number or an SQL expression"""
+    if engine.dialect.name == 'sqlite':
+        # Same text layout SQLAlchemy stores, so comparisons stay lexical
+        return func.strftime('%Y-%m-%d %H:%M:%f', timestamp, func.printf('%+f days', days)).concat('000')
+    return timestamp + func.make_interval(0, 0, 0, 0, 0, 0, days * 86400, type_=Interval)
+
+def upgrade_schema(engine):
+    """
+    Add columns and indexes that tables created by older versions are missing.
+    create_all only creates missing tables, never alters existing ones.
+    """
+    inspector = inspect(engine)
+    missing = {
+        table: [column for column in table.columns
+                if column.name not in {c['name'] for c in inspector.get_columns(table.name)}]
+        for table in Base.metadata.sorted_tables
+    }
+    with engine.begin() as conn:
+        for table, columns in missing.items():
+            for column in columns:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
         
-        self.engine = create_engine(conn_str)
-        Base.metadata.create_all(self.engine)
+        added = {column.name for column in missing[Flashcard.__table__]}
+        if 'question_hash' in added:
+            _backfill_question_hashes(conn)
+        if 'last_reviewed_at' in added:
+            _backfill_review_state(conn, engine)
         
-        # Create session factory
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        # IF NOT EXISTS rather than checkfirst: reflection can't see expression indexes
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+def _backfill_question_hashes(conn):
+    flashcards = Flashcard.__table__
+    rows = conn.execute(select(flashcards.c.id, flashcards.c.question)).fetchall()
+    if rows:
+        conn.execute(
+            flashcards.update().where(flashcards.c.id == bindparam('card_id'))
+                     .values(question_hash=bindparam('hash')),
+            [{'card_id': card_id, 'hash': question_hash(question)} for card_id, question in rows]
+        )
+    # Concurrent read-modify-write saves could create duplicate cards; keep the newest
+    newest = select(func.max(flashcards.c.id)).group_by(flashcards.c.user_id, flashcards.c.question_hash)
+    conn.execute(flashcards.delete().where(flashcards.c.id.not_in(newest)))
+
+def _backfill_review_state(conn, engine):
+    # Rows written before scheduling state was stored were all scheduled by Leitner
+    from scheduling import Leitner
+    flashcards = Flashcard.__table__
+    interval = Leitner().interval_sql(flashcards)
+    conn.execute(flashcards.update().where(flashcards.c.next_review.is_not(None)).values(
+        interval_days=interval,
+        last_reviewed_at=days_after(engine, flashcards.c.next_review, -interval)
+    ))
+
+def init_schema(engine):
+    Base.metadata.create_all(engine)
+    upgrade_schema(engine)
+
+# Connection pool defaults, overridable per deployment under [postgres] in secrets
+POOL_DEFAULTS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800  # seconds
+}
+
+def get_pool_options():
+    """Read connection pool settings from secrets, falling back to POOL_DEFAULTS"""
+    postgres = st.secrets['postgres']
+    return {key: type(default)(postgres.get(key, default))
+            for key, default in POOL_DEFAULTS.items()}
+
+@st.cache_resource(show_spinner=False)
+def get_engine():
+    """Create the process-wide engine and schema once, shared by every session and rerun"""
+    # Create PostgreSQL connection URL from secrets
+    conn_str = (f"postgresql://{st.secrets['postgres']['user']}:"
+               f"{st.secrets['postgres']['password']}@"
+               f"{st.secrets['postgres']['host']}:"
+               f"{st.secrets['postgres']['port']}/"
+               f"{st.secrets['postgres']['database']}")
     
-    def get_user_credentials(self):
-        users = self.session.query(User).all()
+    engine = create_engine(conn_str, **get_pool_options())
+    init_schema(engine)
+    return engine
+
+class UserCredentials(Mapping):
+    """Read-only username -> credentials mapping that loads users on demand"""
+    
+    def __init__(self, db):
+        self.db = db
+        self._loaded = {}
+    
+    def __getitem__(self, username):
+        if username not in self._loaded:
+            self._loaded[username] = self.db.get_user_credential(username)
+        credential = self._loaded[username]
+        if credential is None:
+            raise KeyError(username)
+        return credential
+    
+    def __contains__(self, username):
+        try:
+            self[username]
+            return True
+        except KeyError:
+            return False
+    
+    def __iter__(self):
+        return self.db.iter_usernames()
+    
+    def __len__(self):
+        return self.db.count_users()
+    
+    def invalidate(self, username=None):
+        """Forget a loaded user (or all of them) so the next lookup hits the database"""
+        if username is None:
+            self._loaded.clear()
+        else:
+            self._loaded.pop(username, None)
+            self._loaded.pop(username.lower(), None)
+
+class UserDB:
+    # review_params() keys appended to the reviews table
+    REVIEW_LOG_COLUMNS = ('user_id', 'question_hash', 'reviewed_at', 'correct', 'difficulty',
+                          'latency_ms', 'grader_tier')
+    
+    def __init__(self, engine=None, scheduler=None):
+        self.engine = engine if engine is not None else get_engine()
+        self._scheduler = scheduler
         
-        credentials = {
-            'usernames': {
-                user.username: {
-                    'email': user.email,
-                    'name': user.name,
-                    'password': user.password
-                } for user in users
-            }
+        # Sessions are short-lived: each unit of work checks a connection out
+        # of the shared pool and returns it as soon as it finishes
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        self.credentials = UserCredentials(self)
+    
+    @contextmanager
+    def session_scope(self):
+        """Provide a transactional scope around a series of operations"""
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @property
+    def scheduler(self):
+        # Resolved on first use; scheduling pulls in numpy, which the login page doesn't need
+        if self._scheduler is None:
+            from scheduling import get_scheduler
+            self._scheduler = get_scheduler()
+        return self._scheduler
+    
+    def get_user_credentials(self):
+        # Users are looked up by username when the authenticator asks for them,
+        # so building credentials costs nothing however many users exist
+        return {'usernames': self.credentials}
+    
+    @timed('db.get_user_credential')
+    def get_user_credential(self, username):
+        with self.session_scope() as session:
+            user = session.get(User, username)
+            if user is None:
+                # The authenticator lowercases what the user typed
+                user = session.query(User).filter(
+                    func.lower(User.username) == username.lower()
+                ).first()
+        if user is None:
+            return None
+        return {
+            'email': user.email,
+            'name': user.name,
+            'password': user.password
         }
-        return credentials
     
+    def iter_usernames(self):
+        with self.session_scope() as session:
+            for (username,) in session.query(User.username).yield_per(1000):
+                yield username
+    
+    def count_users(self):
+        with self.session_scope() as session:
+            return session.query(func.count(User.username)).scalar()
+    
+    @timed('db.add_user')
     def add_user(self, username, email, name, password):
-        try:
-            hashed_password = stauth.Hasher([password]).generate()[0]
-            new_user = User(
-                username=username,
-                email=email,
-                name=name,
-                password=hashed_password
-            )
-            self.session.add(new_user)
-            self.session.commit()
-            return True
-        except Exception as e:
-            self.session.rollback()
-            raise e
+        hashed_password = get_password_hasher().hash(password, username=username)
+        new_user = User(
+            username=username,
+            email=email,
+            name=name,
+            password=hashed_password
+        )
+        with self.session_scope() as session:
+            session.add(new_user)
+        self.credentials.invalidate(username)
+        return True
     
+    @timed('db.get_user')
     def get_user(self, username):
-        return self.session.query(User).filter(User.username == username).first()
+        with self.session_scope() as session:
+            return session.query(User).filter(User.username == username).first()
     
     def delete_user(self, username):
-        user = self.get_user(username)
-        if user:
-            self.session.delete(user)
-            self.session.commit()
-            return True
-        return False
+        with self.session_scope() as session:
+            user = session.query(User).filter(User.username == username).first()
+            if not user:
+                return False
+            session.delete(user)
+        self.credentials.invalidate(username)
+        return True
     
     def validate_signup(self, username, email, password):
         if not username or not email or not password:
@@ -103,43 +373,152 @@ class UserDB:
         if existing_user:
             raise ValueError("Username already exists")
     
+    @timed('db.get_due_cards')
+    def get_due_cards(self, username, limit=20, now=None):
+        """Return up to `limit` cards due for review, most overdue first"""
+        now = now or datetime.utcnow()
+        with self.session_scope() as session:
+            rows = session.query(Flashcard.question, Flashcard.answer).filter(
+                Flashcard.user_id == username,
+                Flashcard.next_review <= now
+            ).order_by(Flashcard.next_review).limit(limit).all()
+        return [{'question': question, 'answer': answer} for question, answer in rows]
+    
+    @timed('db.count_due_cards')
+    def count_due_cards(self, username, now=None):
+        now = now or datetime.utcnow()
+        with self.session_scope() as session:
+            return session.query(func.count(Flashcard.id)).filter(
+                Flashcard.user_id == username,
+                Flashcard.next_review <= now
+            ).scalar()
+    
     def save_flashcard_result(self, username, question, answer, is_correct, difficulty):
-        card = self.session.query(Flashcard).filter(
-            Flashcard.user_id == username,
-            Flashcard.question == question
-        ).first()
-        
-        if not card:
-            card = Flashcard(
-                user_id=username,
-                question=question,
-                answer=answer,
-                box_number=1  # Initialize box_number for new cards
-            )
-            self.session.add(card)
-        
-        # Update box number based on Leitner system
-        if is_correct:
-            if difficulty == "easy":
-                card.box_number = min(5, card.box_number + 1)
-            elif difficulty == "medium":
-                card.box_number = min(5, card.box_number)
-        else:
-            card.box_number = max(1, card.box_number - 1)
-        
-        # Set next review date based on box number
-        intervals = {
-            1: timedelta(days=1),
-            2: timedelta(days=3),
-            3: timedelta(days=7),
-            4: timedelta(days=14),
-            5: timedelta(days=30)
+        params = self.review_params(username, question, answer, is_correct, difficulty)
+        self.save_flashcard_results([params])
+    
+    @timed('db.save_flashcard_results')
+    def save_flashcard_results(self, results):
+        """Apply a batch of review_params() dicts in one transaction"""
+        if not results:
+            return
+        with self.engine.begin() as conn:
+            # One read of the batch's cards, one vectorized schedule, one upsert
+            states = self.card_states(conn, results)
+            cards = self.scheduler.schedule(states, results)
+            conn.execute(self.review_upsert(), cards)
+            conn.execute(self.stats_upsert(), self.daily_counts(states, results))
+            copy_rows(conn, Review.__table__, [{column: result[column] for column in self.REVIEW_LOG_COLUMNS}
+                                               for result in results])
+    
+    @staticmethod
+    def review_params(username, question, answer, is_correct, difficulty, reviewed_at=None, topic=None,
+                      latency_ms=None, grader_tier=None):
+        return {
+            'user_id': username,
+            'question': question,
+            'question_hash': question_hash(question),
+            'answer': answer,
+            'topic': topic,
+            'correct': bool(is_correct),
+            'difficulty': difficulty,
+            'reviewed_at': reviewed_at or datetime.utcnow(),
+            'latency_ms': None if latency_ms is None else int(latency_ms),
+            'grader_tier': grader_tier
         }
-        card.next_review = datetime.utcnow() + intervals[card.box_number]
-        card.last_difficulty = difficulty
-        
-        self.session.commit()
     
-    def __del__(self):
-        # Close session when object is destroyed
-        self.session.close() 
\ No newline at end of file
+    @staticmethod
+    def daily_counts(states, results):
+        """DailyStats increments for a batch; due-card reviews count toward the card's own topic"""
+        counts = {}
+        for result in results:
+            stored = states.get((result['user_id'], result['question_hash']), {})
+            key = (result['user_id'], result['reviewed_at'].date(), result['topic'] or stored.get('topic') or '')
+            reviews, correct = counts.get(key, (0, 0))
+            counts[key] = (reviews + 1, correct + int(result['correct']))
+        return [{'user_id': user_id, 'day': day, 'topic': topic, 'reviews': reviews, 'correct': correct}
+                for (user_id, day, topic), (reviews, correct) in counts.items()]
+    
+    def card_states(self, conn, results):
+        """Stored scheduling state of the cards in a batch, keyed by (user_id, question_hash)"""
+        flashcards = Flashcard.__table__
+        rows = conn.execute(
+            select(flashcards.c.user_id, flashcards.c.question_hash, flashcards.c.topic, flashcards.c.box_number,
+                   flashcards.c.ease_factor, flashcards.c.interval_days, flashcards.c.repetitions)
+            .where(flashcards.c.user_id.in_({r['user_id'] for r in results}),
+                   flashcards.c.question_hash.in_({r['question_hash'] for r in results}))
+            .with_for_update()  # held until the upsert commits
+        ).mappings()
+        return {(row['user_id'], row['question_hash']): dict(row) for row in rows}
+    
+    def review_upsert(self):
+        flashcards = Flashcard.__table__
+        statement = dialect_insert(self.engine)(flashcards)
+        return statement.on_conflict_do_update(
+            index_elements=[flashcards.c.user_id, flashcards.c.question_hash],
+            set_={
+                **{column: statement.excluded[column] for column in (
+                    'box_number', 'ease_factor', 'interval_days', 'repetitions',
+                    'next_review', 'last_reviewed_at', 'last_difficulty'
+                )},
+                # A card keeps the topic it was first studied under
+                'topic': func.coalesce(flashcards.c.topic, statement.excluded.topic)
+            }
+        )
+    
+    def stats_upsert(self):
+        stats = DailyStats.__table__
+        statement = dialect_insert(self.engine)(stats)
+        return statement.on_conflict_do_update(
+            index_elements=[stats.c.user_id, stats.c.day, stats.c.topic],
+            set_={
+                'reviews': stats.c.reviews + statement.excluded.reviews,
+                'correct': stats.c.correct + statement.excluded.correct
+            }
+        )
+    
+    @timed('db.prune_reviews')
+    def prune_reviews(self, older_than, batch_size=10000, now=None):
+        """
+        Delete review log rows older than `older_than` (a timedelta), a batch
+        per transaction so no single delete holds locks for long. Their
+        counts live on in daily_stats. Returns the number of rows deleted.
+        """
+        reviews = Review.__table__
+        cutoff = (now or datetime.utcnow()) - older_than
+        deleted = 0
+        while True:
+            oldest = select(reviews.c.id).where(reviews.c.reviewed_at < cutoff).limit(batch_size)
+            with self.engine.begin() as conn:
+                count = conn.execute(reviews.delete().where(reviews.c.id.in_(oldest))).rowcount
+            deleted += count
+            if count < batch_size:
+                return deleted
+    
+    @timed('db.shift_due_dates')
+    def shift_due_dates(self, username, days):
+        """Move all of a user's reviews `days` later (or earlier, if negative) in one UPDATE"""
+        flashcards = Flashcard.__table__
+        with self.engine.begin() as conn:
+            return conn.execute(
+                flashcards.update().where(flashcards.c.user_id == username)
+                          .values(next_review=days_after(self.engine, flashcards.c.next_review, days))
+            ).rowcount
+    
+    @timed('db.reschedule')
+    def reschedule(self, scheduler=None, username=None):
+        """
+        Recompute next_review from each card's stored state and last review,
+        e.g. after switching algorithms, in one UPDATE for one user or everyone.
+        """
+        scheduler = scheduler or self.scheduler
+        flashcards = Flashcard.__table__
+        interval = scheduler.interval_sql(flashcards)
+        statement = flashcards.update().where(flashcards.c.last_reviewed_at.is_not(None))
+        if username is not None:
+            statement = statement.where(flashcards.c.user_id == username)
+        with self.engine.begin() as conn:
+            return conn.execute(statement.values(
+                interval_days=interval,
+                next_review=days_after(self.engine, flashcards.c.last_reviewed_at, interval)
+            )).rowcount
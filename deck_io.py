@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import func
+
+from database import Flashcard, dialect_insert, question_hash
+from perf import timed
+
+FORMATS = {
+    'csv': {'label': "CSV", 'extension': 'csv', 'mime': 'text/csv'},
+    'jsonl': {'label': "JSON Lines", 'extension': 'jsonl', 'mime': 'application/x-ndjson'},
+    'tsv': {'label': "Anki (tab-separated)", 'extension': 'txt', 'mime': 'text/tab-separated-values'},
+}
+EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'json': 'jsonl', 'tsv': 'tsv', 'txt': 'tsv'}
+
+EXPORT_FIELDS = ('question', 'answer', 'topic', 'box_number', 'next_review')
+# Anki reads these header lines; tags are space-separated, so topics use underscores
+ANKI_HEADER = "#separator:tab\n#html:false\n#tags column:3\n"
+
+def format_for(filename):
+    """Deck format for an uploaded file name, by extension"""
+    extension = os.path.splitext(filename)[1].lstrip('.').lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Unsupported file type: .{extension}")
+    return EXTENSIONS[extension]
+
+def iter_deck(db, username, batch_size=1000):
+    """A user's cards in creation order, read through a server-side cursor `batch_size` rows at a time"""
+    columns = [getattr(Flashcard, field) for field in EXPORT_FIELDS]
+    with db.session_scope() as session:
+        query = session.query(*columns).filter(Flashcard.user_id == username).order_by(Flashcard.id)
+        for row in query.yield_per(batch_size):
+            yield dict(zip(EXPORT_FIELDS, row))
+
+def tsv_field(value):
+    return " ".join(str(value or "").split())
+
+def format_cards(cards, fmt):
+    """Text for a batch of card dicts in the given format"""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        for card in cards:
+            writer.writerow([card[field] for field in EXPORT_FIELDS])
+    elif fmt == 'jsonl':
+        for card in cards:
+            buffer.write(json.dumps(card, default=str, ensure_ascii=False) + "\n")
+    elif fmt == 'tsv':
+        for card in cards:
+            tag = tsv_field(card['topic']).replace(" ", "_")
+            buffer.write(f"{tsv_field(card['question'])}\t{tsv_field(card['answer'])}\t{tag}\n")
+    else:
+        raise ValueError(f"Unknown deck format: {fmt}")
+    return buffer.getvalue()
+
+def export_deck(db, username, fmt, batch_size=1000):
+    """Yield the user's deck as text chunks, one per batch, so memory stays flat however large it is"""
+    if fmt == 'csv':
+        yield ",".join(EXPORT_FIELDS) + "\r\n"
+    elif fmt == 'tsv':
+        yield ANKI_HEADER
+    batch = []
+    for card in iter_deck(db, username, batch_size):
+        batch.append(card)
+        if len(batch) >= batch_size:
+            yield format_cards(batch, fmt)
+            batch = []
+    if batch:
+        yield format_cards(batch, fmt)
+
+@timed('deck_io.export_file')
+def export_file(db, username, fmt, batch_size=1000):
+    """The exported deck as a binary file, spilled to disk past 8 MB; for st.download_button"""
+    spool = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    for chunk in export_deck(db, username, fmt, batch_size):
+        spool.write(chunk.encode('utf-8'))
+    spool.seek(0)
+    return spool
+
+def read_cards(lines, fmt):
+    """
+    Card dicts (question, answer, topic) parsed from an iterable of text lines.
+    Lines without a question or answer come through as None, so callers can count them.
+    """
+    if fmt == 'csv':
+        # A header row names the columns; without one, columns are question, answer, topic
+        rows = csv.reader(lines)
+        header = next(rows, None)
+        if header is None:
+            return
+        fields = [name.strip().lower() for name in header]
+        if 'question' not in fields:
+            fields = ['question', 'answer', 'topic']
+            rows = _prepend(header, rows)
+        records = (dict(zip(fields, row)) for row in rows)
+    elif fmt == 'jsonl':
+        records = (_json_record(line) for line in lines if line.strip())
+    elif fmt == 'tsv':
+        records = (dict(zip(('question', 'answer', 'topic'), line.rstrip("\r\n").split("\t")))
+                   for line in lines if line.strip() and not line.startswith('#'))
+    else:
+        raise ValueError(f"Unknown deck format: {fmt}")
+
+    for record in records:
+        question = str(record.get('question') or "").strip()
+        answer = str(record.get('answer') or "").strip()
+        if not question or not answer:
+            yield None
+            continue
+        topic = str(record.get('topic') or "").strip()
+        yield {'question': question, 'answer': answer,
+               'topic': topic.replace("_", " ") if fmt == 'tsv' else topic}
+
+def _prepend(first, rows):
+    yield first
+    yield from rows
+
+def _json_record(line):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return {}
+    return record if isinstance(record, dict) else {}
+
+@timed('deck_io.import_deck')
+def import_deck(db, username, lines, fmt, batch_size=1000, now=None):
+    """
+    Add cards from `lines` to the user's deck, `batch_size` rows per
+    INSERT ... ON CONFLICT DO NOTHING, so questions already in the deck (or
+    repeated in the file) are skipped. Imported cards are due immediately.
+    Returns counts of imported, duplicate and invalid rows.
+    """
+    now = now or datetime.utcnow()
+    flashcards = Flashcard.__table__
+    statement = dialect_insert(db.engine)(flashcards).on_conflict_do_nothing(
+        index_elements=[flashcards.c.user_id, flashcards.c.question_hash]
+    )
+    before = _count_cards(db, username)
+    attempted = repeated = invalid = 0
+
+    batch = {}
+    for card in read_cards(lines, fmt):
+        if card is None:
+            invalid += 1
+            continue
+        key = question_hash(card['question'])
+        if key in batch:
+            repeated += 1
+            continue
+        batch[key] = {
+            'user_id': username,
+            'question': card['question'],
+            'question_hash': key,
+            'answer': card['answer'],
+            'topic': card['topic'] or None,
+            'box_number': 1,
+            'repetitions': 0,
+            'next_review': now,
+            'created_at': now
+        }
+        if len(batch) >= batch_size:
+            attempted += _insert_batch(db, statement, batch)
+            batch = {}
+    attempted += _insert_batch(db, statement, batch)
+
+    imported = _count_cards(db, username) - before
+    return {'imported': imported, 'duplicates': repeated + attempted - imported, 'invalid': invalid}
+
+def _insert_batch(db, statement, batch):
+    if batch:
+        with db.engine.begin() as conn:
+            conn.execute(statement, list(batch.values()))
+    return len(batch)
+
+def _count_cards(db, username):
+    with db.session_scope() as session:
+        return session.query(func.count(Flashcard.id)).filter(Flashcard.user_id == username).scalar()
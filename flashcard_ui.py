@@ -1,10 +1,35 @@
+import hashlib
+import io
+import os
+
 import streamlit as st
 
+from perf import timed
+
+THEME_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'theme.css')
+THEME_URL = 'app/static/theme.css'  # needs [server] enableStaticServing
+
+@st.cache_resource(show_spinner=False)
+def theme_version(path=THEME_PATH):
+    """Short content hash of the stylesheet, so a changed theme gets a new URL"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def load_theme():
+    """
+    Link the static theme instead of sending its CSS on every rerun.
+    st.html drops <link> tags, so the sheet is pulled in with @import; a
+    style-only block takes no space in the layout.
+    """
+    st.html(f'<style>@import url("{THEME_URL}?v={theme_version()}");</style>')
+
+@timed('ui.show_progress')
 def show_progress(current_index, total_cards):
     progress = current_index / total_cards
     st.progress(progress)
     st.caption(f"Card {current_index + 1} of {total_cards}")
 
+@timed('ui.show_question')
 def show_question(question):
     st.markdown(f"""
     <div class='question-card'>
@@ -12,31 +37,20 @@ def show_question(question):
     </div>
     """, unsafe_allow_html=True)
 
-def show_answer_input():
+@timed('ui.show_answer_input')
+def show_answer_input(key="answer_input"):
     st.markdown("##### Your Answer")
-    return st.text_area("", placeholder="Type your answer here...", key="answer_input", height=100)
+    return st.text_area("", placeholder="Type your answer here...", key=key, height=100)
 
+@timed('ui.show_feedback')
 def show_feedback(correct_answer, user_answer, feedback):
-    # Create a container for the entire feedback section
-    with st.container():
-        if isinstance(feedback, list):
-            feedback = feedback[0]
-        
-        is_correct = feedback.get('correct', False)
-        
-        # Apply styling based on correctness
-        if is_correct:
-            st.markdown("""
-                <style>
-                    [data-testid="stVerticalBlock"] > [data-testid="stVerticalBlock"] {
-                        background-color: #f0faf4;
-                        padding: 1rem;
-                        border-radius: 8px;
-                        border: 1px solid #dcfce7;
-                    }
-                </style>
-            """, unsafe_allow_html=True)
-        
+    if isinstance(feedback, list):
+        feedback = feedback[0]
+    
+    is_correct = feedback.get('correct', False)
+    
+    # The container key becomes a CSS class; theme.css styles the correct state
+    with st.container(key="feedback-correct" if is_correct else "feedback-incorrect"):
         st.markdown(f"**Correct Answer:** {correct_answer}")
         st.markdown("**Your Answer:**")
         st.write(user_answer)
@@ -47,6 +61,7 @@ def show_feedback(correct_answer, user_answer, feedback):
             st.error(feedback.get('explanation', 'Incorrect. Try again.'))
         return is_correct
 
+@timed('ui.show_difficulty_buttons')
 def show_difficulty_buttons(disabled=False):
     st.markdown("##### How well did you know this?")
     col1, col2, col3 = st.columns(3)
@@ -56,9 +71,70 @@ def show_difficulty_buttons(disabled=False):
         'hard': col3.button("😓 Hard", disabled=disabled, use_container_width=True, key="hard_btn")
     }
 
+@timed('ui.show_next_button')
 def show_next_button(text="Next Card", disabled=False):
     return st.button(text, disabled=disabled, use_container_width=True)
 
+@timed('ui.show_progress_dashboard')
+def show_progress_dashboard(stats, username):
+    """Long-term progress from analytics.ProgressStats: due cards, boxes, accuracy and topics"""
+    due = stats.due_counts(username)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Due now", due['now'])
+    col2.metric("Due in 24h", due['next_24h'])
+    col3.metric("Due this week", due['next_7d'])
+    
+    st.markdown("##### Cards per box")
+    st.bar_chart({'cards': stats.box_counts(username)})
+    
+    accuracy = stats.accuracy_by_day(username)
+    if accuracy.empty:
+        st.caption("Review some cards to see your accuracy over time.")
+        return
+    st.markdown("##### Accuracy over the last 30 days")
+    st.line_chart(accuracy['accuracy'])
+    
+    st.markdown("##### Retention by topic")
+    st.dataframe(
+        stats.topic_retention(username)[['topic', 'reviews', 'retention']],
+        hide_index=True,
+        column_config={'retention': st.column_config.ProgressColumn("retention", min_value=0, max_value=1)}
+    )
+
+@timed('ui.show_deck_transfer')
+def show_deck_transfer(db, username):
+    """Download the user's cards or import a deck file (CSV, JSON Lines or Anki text)"""
+    from deck_io import EXTENSIONS, FORMATS, export_file, format_for, import_deck
+    
+    with st.expander("📦 Import or export cards"):
+        fmt = st.radio("Format", list(FORMATS), format_func=lambda f: FORMATS[f]['label'],
+                       horizontal=True, key="deck_format")
+        # Exported only on request, not on every rerun; the file is offered until the next rerun
+        if st.button("📦 Prepare export", use_container_width=True):
+            with st.spinner("Exporting cards..."):
+                data = export_file(db, username, fmt).read()
+            st.download_button(
+                "⬇️ Download my cards",
+                data=data,
+                file_name=f"memapp-cards.{FORMATS[fmt]['extension']}",
+                mime=FORMATS[fmt]['mime'],
+                on_click="ignore",
+                use_container_width=True
+            )
+        
+        uploaded = st.file_uploader("Import a deck", type=list(EXTENSIONS), key="deck_upload")
+        if uploaded is not None and st.button("⬆️ Import cards", use_container_width=True):
+            try:
+                with st.spinner("Importing cards..."):
+                    lines = io.TextIOWrapper(uploaded, encoding='utf-8-sig', newline='')
+                    counts = import_deck(db, username, lines, format_for(uploaded.name))
+            except (ValueError, UnicodeDecodeError) as e:
+                st.error(f"Could not import {uploaded.name}: {e}")
+                return
+            st.success(f"Imported {counts['imported']} cards. "
+                       f"Skipped {counts['duplicates']} already in your deck"
+                       f" and {counts['invalid']} without a question or answer.")
+
 def show_error(error_message, show_state=False):
     """Display error message and optionally show session state for debugging"""
     st.error(f"🐛 Error: {error_message}")
@@ -68,14 +144,15 @@ def show_error(error_message, show_state=False):
             st.write("Session State:")
             # Filter out sensitive information
             debug_state = {k: v for k, v in st.session_state.items() 
-                         if k not in ['config', 'authentication_status', 'password']}
+                         if k not in ['config', 'authentication_status', 'password', 'review_buffer', 'deck_stream', 'prefetcher']}
             st.json(debug_state)
 
 def clear_session_state():
     """Clear all flashcard-related session state and UI elements"""
     try:
         # First, clear all session state
-        keys_to_preserve = {'config', 'initialized', 'username', 'name', 'authentication_status'}
+        keys_to_preserve = {'config', 'initialized', 'username', 'name', 'authentication_status',
+                            'review_buffer', 'prefetcher', 'studied_cards'}
         preserved_values = {k: st.session_state[k] for k in keys_to_preserve if k in st.session_state}
         
         # Clear everything else
@@ -121,6 +198,7 @@ def initialize_session():
     except Exception as e:
         show_error(f"Error initializing session: {str(e)}", show_state=True)
 
+@timed('ui.show_study_session_summary')
 def show_study_session_summary(results):
     try:
         if not results or st.session_state.get('clearing_session'):
@@ -163,6 +241,8 @@ def show_study_session_summary(results):
                 with cols[0]:
                     st.markdown(f"**Your Answer:**\n{result['user_answer']}")
                     st.markdown(f"**Correct Answer:**\n{result['correct_answer']}")
+                    if result.get('explanation'):
+                        st.caption(result['explanation'])
                 with cols[1]:
                     st.markdown(f"**Result:** {'✅' if result['correct'] else '❌'}")
                     st.markdown(f"**Difficulty:** {result['difficulty'].title()} {'😊' if result['difficulty']=='easy' else '😐' if result['difficulty']=='medium' else '😓'}")
@@ -172,7 +252,6 @@ def show_study_session_summary(results):
         col1, col2, col3 = st.columns([1, 2, 1])
         with col2:
             if st.button("🔄 Start New Session", use_container_width=True):
-                st.write("DEBUG: Start New Session clicked")
                 st.session_state.update({
                     'show_form_only': True,
                     'clearing_session': True,
@@ -0,0 +1,191 @@
+import re
+import threading
+
+import streamlit as st
+
+from perf import timed
+
+# Tier names, in escalation order; CACHED marks verdicts served from the feedback cache
+EXACT, SIMILARITY, CACHED, LLM = 'exact', 'similarity', 'cache', 'llm'
+TIERS = (EXACT, SIMILARITY, CACHED, LLM)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this
+to was were which with what who whom how why when where does do did
+""".split())
+NEGATIONS = frozenset("not no never none isnt arent wasnt werent dont doesnt didnt cannot cant".split())
+NON_ANSWERS = frozenset({"", "idk", "i dont know", "dont know", "no idea", "not sure", "pass", "skip", "?"})
+
+# Signed and decimal numbers ("-40", "3.14"), then words keeping inner dots and
+# trailing + or # ("node.js", "c++", "c#"); other punctuation separates tokens
+TOKEN = re.compile(r"(?<![\w.])[-+]?\d+(?:\.\d+)*|\w+(?:\.\w+)*[+#]*")
+
+def normalize_answer(text):
+    """Lowercase, drop punctuation that doesn't change meaning and collapse whitespace"""
+    return " ".join(TOKEN.findall(str(text or "").lower().replace("'", "")))
+
+def tokenize(text):
+    return normalize_answer(text).split()
+
+def content_words(text):
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+def edit_distance(a, b):
+    """Edit distance between two words, counting a swap of adjacent letters as one edit"""
+    rows = [list(range(len(b) + 1))]
+    for i in range(1, len(a) + 1):
+        row = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(rows[-1][j] + 1, row[j - 1] + 1, rows[-1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, rows[-2][j - 2] + 1)
+            row.append(cost)
+        rows.append(row)
+    return rows[-1][-1]
+
+def is_typo(word, expected):
+    """
+    True if `word` is a misspelling of `expected`: a single edit inside a word
+    of six or more letters, keeping its first and last letters. Numbers never are.
+    """
+    if word == expected:
+        return True
+    if not (word.isalpha() and expected.isalpha()) or min(len(word), len(expected)) < 6:
+        return False
+    return word[0] == expected[0] and word[-1] == expected[-1] and edit_distance(word, expected) <= 1
+
+def in_order(words, reference):
+    """True if the words shared with the reference appear in the reference's order"""
+    shared = set(words) & set(reference)
+    return [w for w in dict.fromkeys(words) if w in shared] == [w for w in dict.fromkeys(reference) if w in shared]
+
+def adds_negation(answer, user_answer):
+    """True if the user's answer negates something the reference doesn't; overlap can't see that"""
+    return bool(NEGATIONS.intersection(tokenize(user_answer)) - NEGATIONS.intersection(tokenize(answer)))
+
+class GradingStats:
+    """
+    Thread-safe per-tier verdict counters, shared by every session in the process.
+    Grader.grade records its own tiers; callers record CACHED or LLM for the
+    answers it escalates, once they know which one served the verdict.
+    """
+
+    def __init__(self):
+        self._counts = dict.fromkeys(TIERS, 0)
+        self._lock = threading.Lock()
+
+    def record(self, tier):
+        with self._lock:
+            self._counts[tier] += 1
+
+    def counts(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def hit_rates(self):
+        counts = self.counts()
+        total = sum(counts.values())
+        return {tier: (count / total if total else 0.0) for tier, count in counts.items()}
+
+class Grader:
+    """
+    Tiered answer grader that only escalates ambiguous answers to Claude.
+
+    Tier 0 (exact) handles blank or "don't know" answers, exact matches after
+    normalization and word-for-word matches with a typo in longer words the
+    question already gives away.
+    Tier 1 (similarity) scores the user's answer against the reference with a
+    weighted term-frequency cosine, where words already in the question count
+    for `question_weight`, since repeating the question is not evidence of
+    knowing the answer; it only accepts answers that keep every key word of the
+    reference (its content words not already in the question) in order and
+    don't pick an alternative the question offered.
+    grade() returns a feedback dict when a tier is confident and None when the
+    answer should go to the LLM.
+    """
+
+    def __init__(self, accept_threshold=0.85, reject_threshold=None, question_weight=0.25, stats=None):
+        self.accept_threshold = accept_threshold
+        # None disables local rejection by similarity; paraphrases can share no words
+        self.reject_threshold = reject_threshold
+        self.question_weight = question_weight
+        self.stats = stats or GradingStats()
+
+    @timed('grader.grade')
+    def grade(self, question, answer, user_answer):
+        verdict = self.exact_verdict(question, answer, user_answer)
+        if verdict is not None:
+            self.stats.record(EXACT)
+            return {**verdict, 'tier': EXACT}
+
+        verdict = self.similarity_verdict(question, answer, user_answer)
+        if verdict is not None:
+            self.stats.record(SIMILARITY)
+            return {**verdict, 'tier': SIMILARITY}
+        return None
+
+    def exact_verdict(self, question, answer, user_answer):
+        user = normalize_answer(user_answer)
+        expected = normalize_answer(answer)
+        # Before the non-answer check: "pass" can be the right answer
+        if user == expected:
+            return {'correct': True, 'explanation': "Exactly right!"}
+        if user in NON_ANSWERS:
+            return {'correct': False, 'explanation': f"No answer given. The correct answer is: {answer}"}
+        if adds_negation(answer, user_answer):
+            return None
+        # Only words the question gives away may be misspelled; a near miss on a
+        # key word ("Cystine" for "Cysteine") can be a different term
+        key_words = self.key_words(question, answer)
+        words, expected_words = user.split(), expected.split()
+        if len(words) == len(expected_words) and all(
+                word == expected_word or (expected_word not in key_words and is_typo(word, expected_word))
+                for word, expected_word in zip(words, expected_words)):
+            return {'correct': True, 'explanation': "Correct (allowing for small spelling differences)."}
+        return None
+
+    def similarity(self, question, answer, user_answer):
+        """Weighted cosine similarity between the reference and user answers, 0..1"""
+        reference = content_words(answer)
+        user = content_words(user_answer)
+        if not reference or not user:
+            return 0.0
+
+        import numpy as np  # Deferred: only answers that reach this tier need it
+
+        vocabulary = {token: i for i, token in enumerate(dict.fromkeys(reference + user))}
+        question_tokens = set(tokenize(question))
+        weights = np.array([self.question_weight if token in question_tokens else 1.0
+                            for token in vocabulary])
+
+        reference_vec = np.bincount([vocabulary[t] for t in reference], minlength=len(vocabulary)) * weights
+        user_vec = np.bincount([vocabulary[t] for t in user], minlength=len(vocabulary)) * weights
+        norm = np.linalg.norm(reference_vec) * np.linalg.norm(user_vec)
+        return float(reference_vec @ user_vec / norm) if norm else 0.0
+
+    def key_words(self, question, answer):
+        """Content words of the answer not given away by the question; all of them if it gives everything away"""
+        reference = content_words(answer)
+        question_tokens = set(tokenize(question))
+        return {token for token in reference if token not in question_tokens} or set(reference)
+
+    def similarity_verdict(self, question, answer, user_answer):
+        if adds_negation(answer, user_answer):
+            return None
+        score = self.similarity(question, answer, user_answer)
+        reference, user = content_words(answer), content_words(user_answer)
+        # A high score alone can't tell "Saturn is larger than Jupiter" from its reverse,
+        # or "a mixture" from "a compound" when the question offered both
+        alternatives = set(tokenize(question)) - set(reference)
+        accepts = (self.key_words(question, answer) <= set(user) and in_order(user, reference)
+                   and not alternatives.intersection(user))
+        if score >= self.accept_threshold and accepts:
+            return {'correct': True, 'explanation': f"Correct! The expected answer was: {answer}"}
+        if self.reject_threshold is not None and score <= self.reject_threshold:
+            return {'correct': False, 'explanation': f"Not quite. The correct answer is: {answer}"}
+        return None
+
+@st.cache_resource(show_spinner=False)
+def get_grader():
+    """Process-wide grader; thresholds can be tuned under [grading] in secrets"""
+    return Grader(**dict(st.secrets.get('grading', {})))
@@ -0,0 +1,170 @@
+import logging
+import multiprocessing
+import sys
+import threading
+import time
+import types
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+import bcrypt
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+class HashingBusy(Exception):
+    """A password operation was refused by the admission limits"""
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+def _checkpw(password, hashed):
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+def _ready():
+    return True
+
+@contextmanager
+def _bare_main():
+    """
+    Streamlit runs app.py as the __main__ module, and spawned processes
+    re-import __main__ by path, which would run the whole app in every
+    worker. Show them an empty __main__ while they start.
+    """
+    saved = sys.modules['__main__']
+    placeholder = types.ModuleType('__main__')
+    sys.modules['__main__'] = placeholder
+    try:
+        yield
+    finally:
+        # Another session's rerun may have installed its own __main__ meanwhile
+        if sys.modules['__main__'] is placeholder:
+            sys.modules['__main__'] = saved
+
+class AdmissionLimiter:
+    """Sliding-window limit of attempts per key, e.g. ('user', name) or ('ip', address)"""
+
+    def __init__(self, limits, window=60.0, clock=time.monotonic):
+        self.limits = limits  # kind -> attempts allowed per window
+        self.window = window
+        self._clock = clock
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def admit(self, keys):
+        """Record an attempt for every key, or raise HashingBusy without recording any"""
+        now = self._clock()
+        with self._lock:
+            windows = []
+            for kind, value in keys:
+                limit = self.limits.get(kind)
+                if limit is None:
+                    continue
+                attempts = self._attempts.setdefault((kind, value), deque())
+                while attempts and attempts[0] <= now - self.window:
+                    attempts.popleft()
+                if len(attempts) >= limit:
+                    raise HashingBusy("Too many attempts. Please wait a minute and try again.")
+                windows.append(attempts)
+            for attempts in windows:
+                attempts.append(now)
+            # Forget keys whose window has fully expired
+            if len(self._attempts) > 10000:
+                self._attempts = {key: attempts for key, attempts in self._attempts.items()
+                                  if attempts and attempts[-1] > now - self.window}
+
+def client_keys(username=None):
+    """Admission keys for the current request: the username and, inside Streamlit, the client IP"""
+    keys = []
+    if username:
+        keys.append(('user', username.strip().lower()))
+    try:
+        ip_address = st.context.ip_address
+    except Exception:
+        ip_address = None
+    if ip_address:
+        keys.append(('ip', ip_address))
+    return keys
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a bounded process pool.
+
+    bcrypt is deliberately slow; on the script thread it holds up the whole
+    rerun and, during signup waves, competes with every other session. Here
+    each call waits on a worker process instead. At most `max_pending`
+    operations are queued or running across the process, and each user and
+    client IP gets `limits[kind]` attempts per `window` seconds; anything
+    beyond that raises HashingBusy straight away.
+    """
+
+    def __init__(self, max_workers=2, max_pending=16, limits=None, window=60.0, rounds=12, timeout=30.0):
+        self.max_workers = max_workers
+        self.executor = self._start_pool()
+        self._restart_lock = threading.Lock()
+        self.rounds = rounds
+        self.timeout = timeout
+        self.admission = AdmissionLimiter(limits or {'user': 10, 'ip': 30}, window)
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _start_pool(self):
+        # spawn: forking a process full of server threads is not safe
+        executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
+        # Start every worker now, while __main__ can be hidden from them
+        with _bare_main():
+            for _ in range(self.max_workers):
+                executor.submit(_ready)
+        return executor
+
+    def _restart(self, broken):
+        """Replace a pool that lost a worker; concurrent callers rebuild it only once"""
+        with self._restart_lock:
+            if self.executor is broken:
+                logger.warning("Password worker pool broke; starting a new one")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._start_pool()
+
+    def _run(self, keys, fn, *args):
+        self.admission.admit(keys)
+        executor = self.executor
+        try:
+            return self._call(executor, fn, *args)
+        except BrokenProcessPool:
+            # A dead worker breaks the pool for good; without a new one every later login fails
+            self._restart(executor)
+            return self._call(self.executor, fn, *args)
+
+    def _call(self, executor, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("The server is busy signing people in. Please try again in a moment.")
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot stays taken until the worker is done, even if the caller gives up
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy("Signing in took too long. Please try again.")
+
+    def hash(self, password, username=None):
+        return self._run(client_keys(username), _hashpw, password, self.rounds)
+
+    def verify(self, password, hashed, username=None):
+        return self._run(client_keys(username), _checkpw, password, hashed)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+@st.cache_resource(show_spinner=False)
+def get_password_hasher():
+    """Process-wide hasher; pool size and limits can be tuned under [passwords] in secrets"""
+    options = dict(st.secrets.get('passwords', {}))
+    if 'limits' in options:
+        options['limits'] = dict(options['limits'])
+    return PasswordHasher(**options)
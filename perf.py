@@ -0,0 +1,163 @@
+"""
+Lightweight timing spans.
+
+Wrap a block in `with span("name"):` or a function in `@timed("name")`.
+Durations go into a process-wide ring buffer that backs the sidebar latency
+panel and a Prometheus text export.
+"""
+import functools
+import inspect
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+class SpanRecorder:
+    """Thread-safe ring buffer of recent span durations plus lifetime totals"""
+
+    def __init__(self, capacity=10000):
+        self._spans = deque(maxlen=capacity)
+        self._totals = {}  # name -> [count, seconds]
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._spans.append((name, seconds))
+            totals = self._totals.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def durations(self):
+        """Recent durations in seconds, grouped by span name"""
+        with self._lock:
+            spans = list(self._spans)
+        grouped = {}
+        for name, seconds in spans:
+            grouped.setdefault(name, []).append(seconds)
+        return grouped
+
+    def totals(self):
+        with self._lock:
+            return {name: tuple(totals) for name, totals in self._totals.items()}
+
+    def summary(self):
+        """{name: {count, p50_ms, p95_ms, max_ms}} over the recent window, slowest p95 first"""
+        rows = {}
+        for name, durations in self.durations().items():
+            durations.sort()
+            rows[name] = {
+                'count': len(durations),
+                'p50_ms': 1000 * quantile(durations, 0.5),
+                'p95_ms': 1000 * quantile(durations, 0.95),
+                'max_ms': 1000 * durations[-1]
+            }
+        return dict(sorted(rows.items(), key=lambda item: item[1]['p95_ms'], reverse=True))
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+
+def quantile(sorted_values, q):
+    """Nearest-rank quantile of an already sorted, non-empty list"""
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+# Module-level so spans from every session and thread land in one buffer
+RECORDER = SpanRecorder()
+
+@contextmanager
+def span(name, recorder=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Recorded even when the block raises, e.g. st.rerun()
+        (recorder or RECORDER).record(name, time.perf_counter() - start)
+
+def timed(name):
+    """Decorator recording each call as a span; generators are timed until exhausted or closed"""
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                with span(name):
+                    yield from fn(*args, **kwargs)
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def _metric_label(name):
+    return name.replace('\\', '\\\\').replace('"', '\\"')
+
+def prometheus_text(recorder=None):
+    """Render spans as a Prometheus summary in the text exposition format"""
+    recorder = recorder or RECORDER
+    durations = recorder.durations()
+    lines = [
+        "# HELP memapp_span_seconds Duration of instrumented spans.",
+        "# TYPE memapp_span_seconds summary"
+    ]
+    for name, (count, seconds) in sorted(recorder.totals().items()):
+        label = _metric_label(name)
+        recent = sorted(durations.get(name, []))
+        for q in (0.5, 0.95):
+            if recent:
+                lines.append(f'memapp_span_seconds{{span="{label}",quantile="{q}"}} {quantile(recent, q):.6f}')
+        lines.append(f'memapp_span_seconds_sum{{span="{label}"}} {seconds:.6f}')
+        lines.append(f'memapp_span_seconds_count{{span="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path, recorder=None):
+    """Atomically replace path with the current metrics, e.g. for node_exporter's textfile collector"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".memapp-metrics-")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(prometheus_text(recorder))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+class PrometheusExporter:
+    """Writes the metrics file at most once every `interval` seconds"""
+
+    def __init__(self, path, interval=15.0, recorder=None):
+        self.path = path
+        self.interval = interval
+        self.recorder = recorder
+        self._last = None
+        self._lock = threading.Lock()
+
+    def maybe_export(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._last is not None and now - self._last < self.interval:
+                return False
+            self._last = now
+        try:
+            write_prometheus(self.path, self.recorder)
+        except OSError:
+            logger.exception("Could not write metrics to %s", self.path)
+            return False
+        return True
+
+@st.cache_resource(show_spinner=False)
+def get_prometheus_exporter():
+    """Exporter for [perf] prometheus_file in secrets, or None when no file is configured"""
+    options = dict(st.secrets.get('perf', {}))
+    if not options.get('prometheus_file'):
+        return None
+    return PrometheusExporter(options['prometheus_file'], interval=options.get('export_interval', 15.0))
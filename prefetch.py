@@ -0,0 +1,92 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+class PrefetchPool:
+    """Bounded thread pool shared by every session's prefetcher"""
+
+    def __init__(self, max_workers=4, max_in_flight=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # Caps queued plus running prefetches across the process; extra requests are skipped
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def submit(self, fn):
+        """Run fn in the background, or return None if the process is at its prefetch cap"""
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self.executor.submit(fn)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+class Prefetcher:
+    """
+    Per-session buffer holding at most one deck prepared ahead of time.
+
+    request() starts preparing the deck for a key unless that key is already
+    being prefetched; requesting a different key cancels the previous one.
+    take() hands over the ready deck only if it was prepared for the same key.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.key = None
+        self._future = None
+
+    def request(self, key, fn):
+        if key == self.key and self._future is not None:
+            return
+        self.cancel()
+
+        def prefetch():
+            try:
+                return fn()
+            except Exception:
+                logger.exception("Prefetch for %r failed", key)
+                return None
+
+        future = self.pool.submit(prefetch)
+        if future is not None:
+            self.key, self._future = key, future
+
+    def pending(self, key):
+        """True if a deck for key is ready or still being prepared"""
+        return key == self.key and self._future is not None and not self._future.cancelled()
+
+    def take(self, key, timeout=0):
+        """
+        Return the prefetched deck for key and clear the buffer. Waits up to
+        `timeout` seconds for an unfinished prefetch; returns None on a
+        different key, a failure or a timeout.
+        """
+        if not self.pending(key):
+            return None
+        try:
+            cards = self._future.result(timeout=timeout)
+        except Exception:
+            return None
+        self.key, self._future = None, None
+        return cards or None
+
+    def cancel(self):
+        # A prefetch that already started finishes in the background; its result is dropped
+        if self._future is not None:
+            self._future.cancel()
+        self.key, self._future = None, None
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_pool():
+    return PrefetchPool()
+
+def get_prefetcher():
+    """Return this session's prefetcher, creating it on first use"""
+    if 'prefetcher' not in st.session_state:
+        st.session_state['prefetcher'] = Prefetcher(get_prefetch_pool())
+    return st.session_state['prefetcher']
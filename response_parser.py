@@ -0,0 +1,298 @@
+"""
+Decoding of Claude responses: locating JSON in free text, tolerating common
+formatting slips, and validating the card and feedback shapes the app uses.
+"""
+import json
+import re
+
+from perf import timed
+
+OPENERS = {'[': ']', '{': '}'}
+CLOSERS = {']', '}'}
+
+class ResponseParseError(ValueError):
+    """The response did not contain JSON of the expected shape"""
+
+def response_text(response):
+    """Text of an Anthropic message, or str() of anything else"""
+    content = getattr(response, 'content', None)
+    if content and hasattr(content[0], 'text'):
+        return content[0].text
+    return str(response)
+
+# Only these characters affect structure; everything between them is skipped in C
+STRUCTURAL = re.compile(r'[\[\]{}",\\]')
+
+def _find_json(text, start=0):
+    """
+    Scan from `start` for the first balanced JSON array or object.
+
+    Returns (begin, end, trailing_commas): the span of the candidate and the
+    positions of commas that directly precede a closing bracket. `end` is
+    None if the candidate starting at `begin` never balances. Returns None if
+    there is no opening bracket left. Brackets inside strings are ignored.
+    """
+    begin = None
+    stack = []
+    in_string = False
+    escaped_at = -1
+    last_comma = None
+    trailing_commas = []
+    for match in STRUCTURAL.finditer(text, start):
+        char = match.group()
+        i = match.start()
+        if begin is None:
+            if char in OPENERS:
+                begin = i
+                stack.append(OPENERS[char])
+            continue
+
+        if in_string:
+            if i == escaped_at:
+                continue
+            if char == '\\':
+                escaped_at = i + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            last_comma = None
+        elif char in OPENERS:
+            stack.append(OPENERS[char])
+            last_comma = None
+        elif char in CLOSERS:
+            if char != stack[-1]:
+                break
+            stack.pop()
+            if last_comma is not None and (last_comma == i - 1 or text[last_comma + 1:i].isspace()):
+                trailing_commas.append(last_comma)
+            last_comma = None
+            if not stack:
+                return begin, i + 1, trailing_commas
+        elif char == ',':
+            last_comma = i
+    if begin is None:
+        return None
+    return begin, None, trailing_commas
+
+def _remove(text, positions, offset=0):
+    if not positions:
+        return text
+    parts = []
+    previous = 0
+    for position in positions:
+        parts.append(text[previous:position - offset])
+        previous = position - offset + 1
+    parts.append(text[previous:])
+    return ''.join(parts)
+
+def _decode(text):
+    """json.loads, reporting nesting too deep for the decoder as a parse error rather than RecursionError"""
+    try:
+        return json.loads(text)
+    except RecursionError:
+        raise ResponseParseError("JSON in response is nested too deeply") from None
+
+def iter_json(text):
+    """
+    Yield each JSON array or object embedded in text, in order.
+
+    Code fences and surrounding prose are skipped and trailing commas are
+    dropped. Well-formed responses are decoded with a single scan; when a
+    bracketed stretch turns out not to be JSON, scanning resumes just after
+    its opening bracket.
+    """
+    text = response_text(text)
+    try:
+        # Fast path: a response that is exactly the JSON we asked for
+        data = _decode(text)
+        if isinstance(data, (list, dict)):
+            yield data
+            return
+    except json.JSONDecodeError:
+        pass
+
+    start = 0
+    while True:
+        found = _find_json(text, start)
+        if found is None:
+            return
+        begin, end, trailing_commas = found
+        if end is not None:
+            candidate = _remove(text[begin:end], trailing_commas, offset=begin)
+            try:
+                yield _decode(candidate)
+                start = end
+                continue
+            except json.JSONDecodeError:
+                pass
+        start = begin + 1
+
+def extract_json(text):
+    """Return the first JSON array or object embedded in text"""
+    for data in iter_json(text):
+        return data
+    raise ResponseParseError("No valid JSON found in response")
+
+def loads_lenient(text):
+    """json.loads that tolerates trailing commas"""
+    try:
+        return _decode(text)
+    except json.JSONDecodeError:
+        return extract_json(text)
+
+def is_card(card):
+    return (isinstance(card, dict)
+            and isinstance(card.get('question'), str) and card['question'].strip() != ""
+            and isinstance(card.get('answer'), str) and card['answer'].strip() != "")
+
+def _cards(data):
+    if isinstance(data, dict):
+        # Accept a single card or a wrapper object such as {"flashcards": [...]}
+        lists = [value for value in data.values() if isinstance(value, list)]
+        data = lists[0] if len(lists) == 1 else [data]
+    if not isinstance(data, list):
+        return []
+    return [{'question': card['question'].strip(), 'answer': card['answer'].strip()}
+            for card in data if is_card(card)]
+
+@timed('parse.parse_flashcards')
+def parse_flashcards(text):
+    """Decode a generated deck into a list of {question, answer} dicts"""
+    # Skip bracketed asides such as "[1]" that precede the deck
+    for data in iter_json(text):
+        cards = _cards(data)
+        if cards:
+            return cards
+    raise ResponseParseError("No valid flashcards were found in the response")
+
+def _as_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', 'correct')
+    return bool(value)
+
+def _feedback(data):
+    if not isinstance(data, dict) or 'correct' not in data or 'explanation' not in data:
+        raise ResponseParseError("Invalid feedback format")
+    return {'correct': _as_bool(data['correct']), 'explanation': str(data['explanation'])}
+
+@timed('parse.parse_feedback')
+def parse_feedback(text):
+    """Decode a single {"correct", "explanation"} verdict"""
+    data = extract_json(text)
+    if isinstance(data, list) and data:
+        data = data[0]
+    return _feedback(data)
+
+@timed('parse.parse_batch_feedback')
+def parse_batch_feedback(text, count=None):
+    """
+    Decode a verdict array for `count` items (default: as many as returned) into
+    {index: {"correct", "explanation"}}; bad items are skipped. The model's
+    "index" fields are only trusted when they number the items 0..count-1
+    exactly once each; otherwise verdicts are matched by position, which
+    needs one verdict per item.
+    """
+    data = extract_json(text)
+    if isinstance(data, dict):
+        data = [data]
+    if not isinstance(data, list):
+        raise ResponseParseError("Expected a JSON array of verdicts")
+    count = len(data) if count is None else count
+
+    indices = [item.get('index') if isinstance(item, dict) else None for item in data]
+    indices = [int(index) if str(index).isdigit() else None for index in indices]
+    if None in indices or sorted(indices) != list(range(count)):
+        if len(data) != count:
+            raise ResponseParseError(f"Expected {count} verdicts, got {len(data)} without usable indices")
+        indices = range(count)
+
+    verdicts = {}
+    for index, item in zip(indices, data):
+        try:
+            verdicts[index] = _feedback(item)
+        except ResponseParseError:
+            continue
+    return verdicts
+
+class JSONArrayStreamParser:
+    """
+    Incremental parser for a JSON array of objects arriving in chunks.
+
+    feed() returns each top-level object of the first array as soon as its
+    closing brace arrives, so callers can use early items while the rest of
+    the response is still streaming. Text before the array, including
+    bracketed asides with no objects in them, is ignored.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped_at = -1
+        self._offset = 0  # Position of the current chunk in the whole stream
+        self._item = []
+        self._count = 0
+
+    @property
+    def finished(self):
+        """True once the array's closing bracket has been seen"""
+        return self._finished
+
+    def feed(self, chunk):
+        items = []
+        item_start = 0 if self._depth > 0 else None
+        for match in STRUCTURAL.finditer(chunk):
+            if self._finished:
+                break
+            char = match.group()
+            i = match.start()
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                continue
+
+            if self._in_string:
+                if self._offset + i == self._escaped_at:
+                    continue
+                if char == '\\':
+                    self._escaped_at = self._offset + i + 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in OPENERS:
+                if self._depth == 0:
+                    item_start = i
+                    self._item = []
+                self._depth += 1
+            elif char in CLOSERS:
+                if self._depth == 0:
+                    # Closing bracket of the outer array; an empty one such as
+                    # a "[1]" aside is skipped and the search goes on
+                    if self._count:
+                        self._finished = True
+                    else:
+                        self._started = False
+                    continue
+                self._depth -= 1
+                if self._depth == 0:
+                    self._item.append(chunk[item_start:i + 1])
+                    items.append(loads_lenient(''.join(self._item)))
+                    self._count += 1
+                    self._item = []
+                    item_start = None
+
+        if self._depth > 0 and item_start is not None:
+            self._item.append(chunk[item_start:])
+        self._offset += len(chunk)
+        return items
+
+def iter_json_array_items(chunks):
+    """Yield the items of the first JSON array in a stream of text chunks"""
+    parser = JSONArrayStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.finished:
+            return
@@ -0,0 +1,168 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+import streamlit as st
+
+from database import UserDB
+
+logger = logging.getLogger(__name__)
+
+class ReviewBuffer:
+    """Per-session buffer of review results waiting to be written"""
+
+    def __init__(self, writer, max_size, max_age):
+        self.writer = writer
+        self.max_size = max_size
+        self.max_age = max_age
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        """Buffer one UserDB.review_params() dict; hands a batch off once a threshold is hit"""
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(result)
+        self.writer.track(self)
+        if self.is_due():
+            self.flush()
+
+    def is_due(self, now=None):
+        with self._lock:
+            if not self._pending:
+                return False
+            now = now if now is not None else time.monotonic()
+            return len(self._pending) >= self.max_size or now - self._oldest >= self.max_age
+
+    def take(self):
+        with self._lock:
+            pending, self._pending, self._oldest = self._pending, [], None
+        return pending
+
+    def flush(self):
+        """Queue everything buffered for writing; returns without waiting on the database"""
+        self.writer.enqueue(self.take())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+class ReviewWriter:
+    """
+    Process-wide write-behind queue for review results.
+
+    Sessions buffer results in a ReviewBuffer; batches are written by a single
+    background thread. The writer holds every non-empty buffer, so results are
+    swept after max_age even if their session goes idle or is discarded, and
+    close() (registered with atexit) drains every buffer and the queue before
+    the process exits. Every `prune_interval` seconds the same thread drops
+    review log rows older than `retention`.
+    """
+
+    def __init__(self, db, max_size=20, max_age=5.0, retry_delay=1.0,
+                 retention=timedelta(days=365), prune_interval=6 * 3600.0):
+        self.db = db
+        self.max_size = max_size
+        self.max_age = max_age
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._queue = queue.Queue()
+        self._buffers = set()
+        self._buffers_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def new_buffer(self):
+        return ReviewBuffer(self, self.max_size, self.max_age)
+
+    def track(self, buffer):
+        with self._buffers_lock:
+            self._buffers.add(buffer)
+
+    def enqueue(self, batch):
+        if batch:
+            self._queue.put(batch)
+
+    def close(self, timeout=30.0):
+        """Flush all buffers and wait for the queue to drain"""
+        if self._closed:
+            return
+        self._closed = True
+        self._sweep(force=True)
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _sweep(self, force=False):
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        for buffer in buffers:
+            if force or buffer.is_due():
+                buffer.flush()
+        with self._buffers_lock:
+            self._buffers = {buffer for buffer in self._buffers if len(buffer)}
+
+    def _run(self):
+        last_sweep = last_prune = time.monotonic()
+        while True:
+            if time.monotonic() - last_sweep >= self.max_age:
+                self._sweep()
+                last_sweep = time.monotonic()
+            if time.monotonic() - last_prune >= self.prune_interval:
+                self._prune()
+                last_prune = time.monotonic()
+            try:
+                batch = self._queue.get(timeout=self.max_age)
+            except queue.Empty:
+                continue
+            if batch is None:
+                break
+            # Coalesce whatever else is already queued into the same transaction
+            while True:
+                try:
+                    more = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self._queue.put(None)
+                    break
+                batch.extend(more)
+            self._write(batch)
+
+    def _write(self, batch, attempts=5):
+        for attempt in range(1, attempts + 1):
+            try:
+                self.db.save_flashcard_results(batch)
+                return
+            except Exception:
+                logger.exception("Failed to write %d review results (attempt %d/%d)",
+                                 len(batch), attempt, attempts)
+                time.sleep(self.retry_delay * attempt)
+        logger.error("Dropping %d review results after %d attempts", len(batch), attempts)
+
+    def _prune(self):
+        try:
+            deleted = self.db.prune_reviews(self.retention)
+            if deleted:
+                logger.info("Pruned %d review log rows older than %s", deleted, self.retention)
+        except Exception:
+            logger.exception("Failed to prune the review log")
+
+@st.cache_resource(show_spinner=False)
+def get_review_writer():
+    """Process-wide writer; review log retention can be set under [reviews] in secrets"""
+    options = st.secrets.get('reviews', {})
+    return ReviewWriter(UserDB(), retention=timedelta(days=options.get('retention_days', 365)))
+
+def get_review_buffer():
+    """Return this session's review buffer, creating it on first use"""
+    if 'review_buffer' not in st.session_state:
+        st.session_state['review_buffer'] = get_review_writer().new_buffer()
+    return st.session_state['review_buffer']
@@ -0,0 +1,162 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import numpy as np
+import streamlit as st
+from sqlalchemy import case, func
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+# Stored state for a card that has never been reviewed
+NEW_CARD = {'box_number': 1, 'ease_factor': 2.5, 'interval_days': 0.0, 'repetitions': 0}
+
+def to_arrays(rows, fields):
+    """Column arrays for a list of dicts; missing or NULL values fall back to NEW_CARD"""
+    return {field: np.array([NEW_CARD[field] if row.get(field) is None else row[field] for row in rows],
+                            dtype=float)
+            for field in fields}
+
+def add_days(timestamps, days):
+    """Python datetimes moved by an array of (possibly fractional) days"""
+    moved = np.array(timestamps, dtype='datetime64[us]') + np.round(days * 86400e6).astype('timedelta64[us]')
+    return moved.astype(datetime).tolist()
+
+class Scheduler(ABC):
+    """
+    Computes card state after a review for whole arrays of cards at once.
+
+    review() takes the cards' stored state as arrays (box_number, ease_factor,
+    interval_days, repetitions), whether each answer was correct and its
+    difficulty, and returns the new state. interval_sql() is the interval in
+    days the scheduler assigns for a card's stored state, as an SQL
+    expression, so whole decks can be rescheduled with one UPDATE.
+    """
+
+    name = None
+
+    @abstractmethod
+    def review(self, state, correct, difficulty):
+        pass
+
+    @abstractmethod
+    def interval_sql(self, table):
+        pass
+
+    @staticmethod
+    def streak(state, correct):
+        return np.where(correct, state['repetitions'] + 1, 0)
+
+    def schedule(self, current, reviews):
+        """
+        Card rows to write for a batch of reviews, one per card.
+
+        `current` maps (user_id, question_hash) to the card's stored state and
+        `reviews` are UserDB.review_params() dicts in the order they happened.
+        A card reviewed several times in the batch is advanced once per review.
+        """
+        current = dict(current)
+        rows = {}
+        pending = list(reviews)
+        while pending:
+            # Each round holds at most one review per card, so it vectorizes
+            batch, later, seen = [], [], set()
+            for review in pending:
+                key = (review['user_id'], review['question_hash'])
+                (later if key in seen else batch).append(review)
+                seen.add(key)
+            pending = later
+
+            keys = [(review['user_id'], review['question_hash']) for review in batch]
+            state = to_arrays([current.get(key, {}) for key in keys], NEW_CARD)
+            correct = np.array([bool(review['correct']) for review in batch])
+            difficulty = np.array([review['difficulty'] for review in batch])
+            new_state = self.review(state, correct, difficulty)
+            next_review = add_days([review['reviewed_at'] for review in batch], new_state['interval_days'])
+
+            for i, (key, review) in enumerate(zip(keys, batch)):
+                card = {field: values[i].item() for field, values in new_state.items()}
+                card['box_number'] = int(card['box_number'])
+                card['repetitions'] = int(card['repetitions'])
+                current[key] = card
+                rows[key] = {
+                    'user_id': review['user_id'],
+                    'question': review['question'],
+                    'question_hash': review['question_hash'],
+                    'answer': review['answer'],
+                    'topic': review.get('topic'),
+                    'last_difficulty': review['difficulty'],
+                    'last_reviewed_at': review['reviewed_at'],
+                    'next_review': next_review[i],
+                    **card
+                }
+        return list(rows.values())
+
+class Leitner(Scheduler):
+    """Five boxes: easy answers move up a box, misses move down, the rest stay"""
+
+    name = 'leitner'
+    INTERVALS = {1: 1, 2: 3, 3: 7, 4: 14, 5: 30}  # days until the next review, per box
+
+    def __init__(self):
+        # Indexed by box number; index 0 is unused
+        self._intervals = np.array([0] + [self.INTERVALS[box] for box in sorted(self.INTERVALS)], dtype=float)
+
+    def review(self, state, correct, difficulty):
+        box_delta = np.where(correct, np.where(difficulty == 'easy', 1, 0), -1)
+        box = np.clip(state['box_number'] + box_delta, 1, 5)
+        return {
+            'box_number': box,
+            'ease_factor': state['ease_factor'],
+            'interval_days': self._intervals[box.astype(int)],
+            'repetitions': self.streak(state, correct)
+        }
+
+    def interval_sql(self, table):
+        return case(self.INTERVALS, value=table.c.box_number, else_=self.INTERVALS[1])
+
+class SM2(Scheduler):
+    """
+    SuperMemo 2: each card has an ease factor that grows with easy answers
+    and shrinks with hard ones; intervals go 1, 6, then multiply by the ease.
+    box_number follows the run of correct answers, capped at 5.
+    """
+
+    name = 'sm2'
+    QUALITY = {'easy': 5, 'medium': 4, 'hard': 3}  # quality of a correct answer, 0-5
+    MISSED_QUALITY = 2
+    MIN_EASE = 1.3
+
+    def review(self, state, correct, difficulty):
+        quality = np.where(correct, np.select([difficulty == d for d in DIFFICULTIES],
+                                              [self.QUALITY[d] for d in DIFFICULTIES], 3),
+                           self.MISSED_QUALITY)
+        lapse = 5 - quality
+        ease = np.maximum(self.MIN_EASE, state['ease_factor'] + 0.1 - lapse * (0.08 + lapse * 0.02))
+        repetitions = self.streak(state, correct)
+        interval = np.select(
+            [repetitions <= 1, repetitions == 2],
+            [1.0, 6.0],
+            np.maximum(state['interval_days'], 1.0) * ease
+        )
+        return {
+            'box_number': np.clip(repetitions, 1, 5),
+            'ease_factor': ease,
+            'interval_days': interval,
+            'repetitions': repetitions
+        }
+
+    def interval_sql(self, table):
+        # The interval stored at the last review; a card scheduled by Leitner
+        # keeps its box interval and grows from there
+        return func.coalesce(table.c.interval_days, 1.0)
+
+SCHEDULERS = {scheduler.name: scheduler for scheduler in (Leitner, SM2)}
+
+def get_scheduler(name=None):
+    """Scheduler named by `name` or by [scheduling] algorithm in secrets; Leitner by default"""
+    if name is None:
+        name = st.secrets.get('scheduling', {}).get('algorithm', Leitner.name)
+    try:
+        return SCHEDULERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown scheduling algorithm: {name}")
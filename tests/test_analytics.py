@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from streamlit.testing.v1 import AppTest
+
+from analytics import ProgressStats
+from benchmarks.fakes import seed_users, sqlite_db
+from database import DailyStats
+
+YESTERDAY = datetime(2026, 10, 16, 18, 0)
+TODAY = datetime(2026, 10, 17, 9, 30)
+USER = 'user0000000'
+
+def studied_db():
+    db = sqlite_db()
+    seed_users(db, 2)
+    review = db.review_params
+    db.save_flashcard_results([
+        review(USER, "Glycine?", "G", True, 'easy', YESTERDAY, topic="Amino acids"),
+        review(USER, "Lysine?", "K", False, 'hard', YESTERDAY, topic="Amino acids"),
+        review(USER, "Capital of Yukon?", "Whitehorse", True, 'medium', YESTERDAY, topic="Provinces of Canada"),
+        review('user0000001', "Glycine?", "G", True, 'easy', YESTERDAY, topic="Amino acids"),
+    ])
+    # A due-card session has no topic; the reviews count toward the cards' own
+    db.save_flashcard_results([review(USER, "Lysine?", "K", True, 'easy', TODAY),
+                               review(USER, "Glycine?", "G", True, 'easy', TODAY)])
+    return db
+
+def test_daily_stats_are_maintained_incrementally():
+    db = studied_db()
+    with db.session_scope() as session:
+        rows = {(row.day.isoformat(), row.topic): (row.reviews, row.correct)
+                for row in session.query(DailyStats).filter(DailyStats.user_id == USER)}
+
+    assert rows == {
+        ('2026-10-16', "Amino acids"): (2, 1),
+        ('2026-10-16', "Provinces of Canada"): (1, 1),
+        ('2026-10-17', "Amino acids"): (2, 2),
+    }
+
+def test_progress_figures_come_from_aggregates():
+    stats = ProgressStats(studied_db())
+
+    assert stats.box_counts(USER) == {1: 1, 2: 1, 3: 1, 4: 0, 5: 0}
+    assert stats.due_counts(USER, now=TODAY) == {'now': 0, 'next_24h': 1, 'next_7d': 3}
+
+    accuracy = stats.accuracy_by_day(USER, today=TODAY.date())
+    assert accuracy['reviews'].tolist() == [3, 2]
+    assert accuracy['accuracy'].round(3).tolist() == [0.667, 1.0]
+
+    retention = stats.topic_retention(USER, today=TODAY.date())
+    assert retention['topic'].tolist() == ["Amino acids", "Provinces of Canada"]
+    assert retention['retention'].tolist() == [0.75, 1.0]
+
+def test_dashboard_renders():
+    def page(stats):
+        from flashcard_ui import show_progress_dashboard
+        show_progress_dashboard(stats, 'user0000000')
+
+    at = AppTest.from_function(page, args=(ProgressStats(studied_db()),)).run()
+
+    assert not at.exception
+    assert [metric.label for metric in at.metric] == ["Due now", "Due in 24h", "Due this week"]
+    assert len(at.dataframe) == 1
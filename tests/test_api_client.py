@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from api_client import ConcurrencyLimiter, LimitedClient, LimiterBusy
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+class FlakyMessages:
+    def __init__(self, failures, delay=0.0):
+        self.failures = list(failures)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.failures:
+                raise StatusError(self.failures.pop(0))
+            return "ok"
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class FlakyStreams(FlakyMessages):
+    @contextmanager
+    def stream(self, **kwargs):
+        yield self.create(**kwargs)
+
+class FakeClient:
+    def __init__(self, messages):
+        self.messages = messages
+
+def test_retries_rate_limits_with_backoff():
+    messages = FlakyMessages([429, 529])
+    sleeps = []
+    client = LimitedClient(FakeClient(messages), max_retries=3, base_delay=0.5, sleep=sleeps.append)
+
+    assert client.messages.create(model="m") == "ok"
+    assert messages.calls == 3
+    assert len(sleeps) == 2 and all(0 <= s <= 1.0 for s in sleeps)
+    assert client.stats.snapshot()['retries'] == 2
+
+def test_streams_back_off_without_holding_a_slot():
+    limiter = ConcurrencyLimiter(max_in_flight=1)
+    free_while_sleeping = []
+
+    def sleep(_):
+        with limiter.slot(timeout=0):
+            free_while_sleeping.append(True)
+
+    client = LimitedClient(FakeClient(FlakyStreams([429, 529])), limiter=limiter, sleep=sleep)
+    with client.messages.stream(model="m") as stream:
+        assert stream == "ok"
+        assert limiter.stats.snapshot()['in_flight'] == 1
+    assert free_while_sleeping == [True, True]
+    assert limiter.stats.snapshot()['in_flight'] == 0
+
+def test_other_errors_and_exhausted_retries_propagate():
+    client = LimitedClient(FakeClient(FlakyMessages([400])), sleep=lambda _: None)
+    with pytest.raises(StatusError):
+        client.messages.create()
+
+    messages = FlakyMessages([429] * 5)
+    client = LimitedClient(FakeClient(messages), max_retries=2, sleep=lambda _: None)
+    with pytest.raises(StatusError):
+        client.messages.create()
+    assert messages.calls == 3
+
+def test_limiter_caps_concurrent_requests_and_records_waits():
+    messages = FlakyMessages([], delay=0.05)
+    client = LimitedClient(FakeClient(messages), limiter=ConcurrencyLimiter(max_in_flight=2))
+
+    threads = [threading.Thread(target=client.messages.create) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    snapshot = client.stats.snapshot()
+    assert messages.peak == 2
+    assert snapshot['requests'] == 6 and snapshot['in_flight'] == 0
+    assert snapshot['wait_max_ms'] > 0
+
+def test_limiter_times_out_when_full():
+    limiter = ConcurrencyLimiter(max_in_flight=1)
+    with limiter.slot():
+        with pytest.raises(LimiterBusy):
+            with limiter.slot(timeout=0.01):
+                pass
+    assert limiter.stats.snapshot()['timeouts'] == 1
@@ -0,0 +1,106 @@
+import json
+import time
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from api_client import LimitedClient
+from benchmarks.fakes import PASSWORD, FakeClient, seed_users, sqlite_db, username
+from benchmarks.load_app import APP_PATH, stand_in_backends
+from database import Flashcard
+
+CARDS = 2
+
+class FlakyBatchClient(FakeClient):
+    """Fake client whose batched grading requests fail while `failing` is set"""
+
+    def __init__(self):
+        super().__init__(cards=CARDS)
+        self.failing = True
+        respond = self.messages._respond
+
+        def batch_fails(kwargs):
+            if self.failing and "Item 0:" in kwargs['messages'][0]['content']:
+                raise RuntimeError("overloaded")
+            return respond(kwargs)
+        self.messages._respond = batch_fails
+
+def button(at, label):
+    return next(b for b in at.button if label in b.label)
+
+def saved(db, expected, timeout=3.0):
+    """Cards saved once the background review writer has had up to `timeout` seconds to catch up"""
+    deadline = time.monotonic() + timeout
+    while True:
+        with db.session_scope() as session:
+            count = session.query(Flashcard).count()
+        if count == expected or time.monotonic() > deadline:
+            return count
+        time.sleep(0.01)
+
+class RepeatingDeckClient(FakeClient):
+    """Fake client whose second deck repeats a question from the first"""
+
+    def __init__(self):
+        super().__init__(cards=CARDS)
+        self.decks = [["Glycine?", "Lysine?"], ["lysine? ", "Proline?"]]
+        respond = self.messages._respond
+
+        def next_deck(kwargs):
+            if "flashcards about" in kwargs['messages'][0]['content']:
+                return json.dumps([{"question": q, "answer": "An amino acid"} for q in self.decks.pop(0)])
+            return respond(kwargs)
+        self.messages._respond = next_deck
+
+def logged_in_app():
+    # Process-wide resources from other tests would point at their databases
+    st.cache_resource.clear()
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.secrets['cookie_key'] = "app-test-cookie-key-0123456789abcdef"
+    at.secrets['anthropic_api_key'] = "unused"
+    at.session_state['config'] = {'flashcards_per_session': CARDS}
+    at.run()
+    at.text_input[0].input(username(0))
+    at.text_input[1].input(PASSWORD)
+    button(at, "Login").click().run()
+    return at
+
+def answer_deck_graded_at_end(at):
+    next(box for box in at.checkbox if "Grade all" in box.label).check()
+    button(at, "Amino").click().run()
+    for i in range(CARDS):
+        at.text_area(key=f"answer_input_{i}").input(f"Something about card {i}")
+        button(at, "Submit Answers" if i == CARDS - 1 else "Next Card").click().run()
+
+def test_answers_left_ungraded_are_kept_for_a_retry_instead_of_saved_as_misses():
+    db = sqlite_db()
+    seed_users(db, 1)
+    client = FlakyBatchClient()
+
+    with stand_in_backends(db, LimitedClient(client)):
+        at = logged_in_app()
+        answer_deck_graded_at_end(at)
+
+        assert not at.exception
+        assert "overloaded" in at.error[0].value
+        assert len(at.session_state['pending_answers']) == CARDS
+        assert saved(db, 0) == 0
+
+        client.failing = False
+        button(at, "Retry grading").click().run()
+        assert not at.exception
+        assert not at.error
+        assert len(at.session_state['session_results']) == CARDS
+        assert saved(db, CARDS) == CARDS
+
+def test_continuing_a_topic_leaves_out_the_questions_just_studied():
+    db = sqlite_db()
+    seed_users(db, 1)
+
+    with stand_in_backends(db, LimitedClient(RepeatingDeckClient())):
+        at = logged_in_app()
+        answer_deck_graded_at_end(at)
+        button(at, "Continue with Amino acids").click().run()
+
+        assert not at.exception
+        assert [card['question'] for card in at.session_state['current_cards']] == ["Proline?"]
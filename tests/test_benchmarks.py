@@ -0,0 +1,24 @@
+from benchmarks.fakes import FakeClient, seed_users, sqlite_db
+from benchmarks.run import compare
+from claude_service import ClaudeService, SingleFlight
+
+def test_compare_flags_slowdowns_beyond_threshold():
+    baseline = {'results': [{'benchmark': 'a', 'seconds': 1.0}, {'benchmark': 'b', 'seconds': 1.0}]}
+    current = {'results': [{'benchmark': 'a', 'seconds': 1.1}, {'benchmark': 'b', 'seconds': 1.5},
+                           {'benchmark': 'new', 'seconds': 9.0}]}
+
+    rows, regressions = compare(baseline, current, threshold=0.2)
+    assert [row[0] for row in rows] == ['a', 'b']
+    assert regressions == ['b']
+
+def test_stand_ins_serve_the_card_flow():
+    db = sqlite_db()
+    seed_users(db, 3)
+    assert db.get_user_credentials()['usernames']['user0000002']['name'] == "User 2"
+
+    claude = ClaudeService(client=FakeClient(cards=4), flights=SingleFlight())
+    cards = list(claude.stream_flashcards("Amino acids"))
+    assert len(cards) == 4
+    db.save_flashcard_results([db.review_params('user0000000', card['question'], card['answer'], True, 'easy')
+                               for card in cards])
+    assert db.count_due_cards('user0000000') == 0
@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from benchmarks.fakes import sqlite_db
+from caches import CACHED, DeckCache, FeedbackCache
+from database import DeckCacheEntry, FeedbackCacheEntry
+
+MODEL = 'claude-test'
+
+def cards(*questions):
+    return [{'question': question, 'answer': question.upper()} for question in questions]
+
+def pool(db):
+    with db.engine.connect() as conn:
+        return json.loads(conn.execute(select(DeckCacheEntry.__table__.c.cards)).scalar())
+
+def rows(db, table):
+    with db.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar()
+
+def age(db, table, days):
+    """Move every entry's creation time `days` into the past"""
+    with db.engine.begin() as conn:
+        conn.execute(table.update().values(created_at=datetime.utcnow() - timedelta(days=days)))
+
+def test_deck_cache_serves_a_subset_only_once_the_pool_is_varied_enough():
+    cache = DeckCache(sqlite_db(), variety=2)
+    cache.put("Amino acids", MODEL, cards("a", "b", "c"))
+    assert cache.get("amino  ACIDS", 2, MODEL) is None
+
+    # Repeated questions don't grow the pool
+    cache.put("Amino acids", MODEL, cards("A ", "d"))
+    deck = cache.get("amino  ACIDS", 2, MODEL)
+    assert len(deck) == 2
+    assert {card['question'] for card in deck} <= {"a", "b", "c", "d"}
+    assert len(pool(cache.db)) == 4
+    assert cache.get("Amino acids", 2, 'other-model') is None
+
+def test_deck_cache_entries_expire_after_ttl():
+    db = sqlite_db()
+    cache = DeckCache(db, ttl=timedelta(days=7), variety=1)
+    cache.put("Amino acids", MODEL, cards("a", "b"))
+    age(db, DeckCacheEntry.__table__, 8)
+    assert cache.get("Amino acids", 2, MODEL) is None
+
+    # An expired pool starts over instead of merging
+    cache.put("Amino acids", MODEL, cards("c"))
+    assert cache.get("Amino acids", 1, MODEL) == cards("c")
+    assert cache.get("Amino acids", 2, MODEL) is None
+
+def test_deck_cache_evicts_the_least_recently_used_topic():
+    cache = DeckCache(sqlite_db(), max_entries=2, variety=1)
+    cache.put("Amino acids", MODEL, cards("a"))
+    cache.put("Enzymes", MODEL, cards("b"))
+    assert cache.get("Amino acids", 1, MODEL)
+
+    cache.put("Lipids", MODEL, cards("c"))
+    assert cache.get("Enzymes", 1, MODEL) is None
+    assert cache.get("Amino acids", 1, MODEL) == cards("a")
+    assert cache.get("Lipids", 1, MODEL) == cards("c")
+
+WRONG = {'correct': False, 'explanation': "Glycine is G."}
+
+def test_feedback_cache_memory_layer_fronts_the_shared_table():
+    db = sqlite_db()
+    FeedbackCache(db).put("Glycine?", "G", "K", WRONG)
+
+    # A fresh process reads the table, then serves the triple from memory
+    cache = FeedbackCache(db)
+    assert len(cache.memory) == 0
+    assert cache.get(" glycine?", "g", "k ") == {**WRONG, 'tier': CACHED}
+    assert len(cache.memory) == 1
+    with db.engine.begin() as conn:
+        conn.execute(FeedbackCacheEntry.__table__.delete())
+    assert cache.get("Glycine?", "G", "K") == {**WRONG, 'tier': CACHED}
+    assert cache.get("Glycine?", "G", "L") is None
+
+def test_feedback_cache_keeps_answers_that_differ_in_symbols_apart():
+    cache = FeedbackCache(sqlite_db())
+    cache.put("Which language added classes to C?", "C++", "C", WRONG)
+    assert cache.get("Which language added classes to C?", "C++", "C++") is None
+    assert cache.get("which language added classes to c?", "c++", " c ")['correct'] is False
+
+def test_feedback_cache_table_entries_expire_after_ttl():
+    db = sqlite_db()
+    FeedbackCache(db, ttl=timedelta(days=30)).put("Glycine?", "G", "K", WRONG)
+    age(db, FeedbackCacheEntry.__table__, 31)
+    assert FeedbackCache(db, ttl=timedelta(days=30)).get("Glycine?", "G", "K") is None
+
+def test_feedback_cache_evicts_every_n_writes():
+    db = sqlite_db()
+    table = FeedbackCacheEntry.__table__
+    cache = FeedbackCache(db, max_entries=1, evict_every=3)
+    cache.put("Q1?", "A", "x", WRONG)
+    cache.put("Q2?", "A", "x", WRONG)
+    assert rows(db, table) == 2
+
+    cache.put("Q3?", "A", "x", WRONG)
+    assert rows(db, table) == 1
+    assert FeedbackCache(db).get("Q3?", "A", "x")['correct'] is False
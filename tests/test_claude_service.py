@@ -0,0 +1,144 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from claude_service import ClaudeService, DeckStream, SingleFlight
+
+class FakeMessages:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.calls = []
+        self.error = None
+    
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        
+        class Text:
+            text = "".join(self.chunks)
+        
+        class Message:
+            content = [Text()]
+        return Message()
+    
+    @contextmanager
+    def stream(self, **kwargs):
+        self.calls.append(kwargs)
+        
+        class Stream:
+            text_stream = self._text_stream()
+        yield Stream()
+    
+    def _text_stream(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+class FakeClient:
+    def __init__(self, chunks, delay=0.0):
+        self.messages = FakeMessages(chunks, delay)
+
+def test_stream_flashcards_yields_cards_incrementally():
+    client = FakeClient(['[{"question":"A?",', '"answer":"a"},{"question":"B?"', ',"answer":"b"}]'])
+    claude = ClaudeService(client=client)
+    
+    cards = claude.stream_flashcards("letters")
+    assert next(cards) == {"question": "A?", "answer": "a"}
+    assert next(cards) == {"question": "B?", "answer": "b"}
+    assert client.messages.calls[0]['model'] == claude.model
+
+def test_deck_stream_serves_first_card_before_the_deck_finishes():
+    chunks = ['[{"question":"A?","answer":"a"},'] + ['{"question":"B?","answer":"b"}]']
+    claude = ClaudeService(client=FakeClient(chunks, delay=0.2))
+    completed = []
+    
+    stream = DeckStream(claude.stream_flashcards("letters"), on_complete=completed.append).start()
+    assert stream.wait_for(1, timeout=5) == 1
+    assert not stream.done
+    
+    assert stream.wait_for(3, timeout=5) == 2
+    assert stream.done and stream.error is None
+    stream.join(timeout=5)
+    assert completed == [stream.cards]
+
+def run_concurrently(fn, count):
+    results, errors = [None] * count, [None] * count
+    
+    def call(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            errors[i] = e
+    
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results, errors
+
+def test_concurrent_identical_requests_share_one_call():
+    client = FakeClient(['[{"question":"A?","answer":"a"}]'], delay=0.2)
+    flights = SingleFlight()
+    request = lambda: flights.do("amino acids", client.messages.create)
+    
+    results, errors = run_concurrently(request, 10)
+    assert errors == [None] * 10
+    assert len({id(result) for result in results}) == 1
+    assert len(client.messages.calls) == 1
+    assert flights.coalesced == 9
+    
+    # Once the request has landed the next call goes upstream again
+    request()
+    assert len(client.messages.calls) == 2
+
+def test_coalesced_streams_receive_every_card():
+    client = FakeClient(['[{"question":"A?","answer":"a"},', '{"question":"B?","answer":"b"}]'], delay=0.1)
+    claude = ClaudeService(client=client, flights=SingleFlight())
+    
+    results, errors = run_concurrently(lambda: list(claude.stream_flashcards("letters")), 5)
+    assert errors == [None] * 5
+    assert all(len(cards) == 2 for cards in results)
+    assert len(client.messages.calls) == 1
+
+def test_prefetch_never_joins_the_deck_being_studied():
+    client = FakeClient(['[{"question":"A?","answer":"a"},', '{"question":"B?","answer":"b"}]'], delay=0.3)
+    flights = SingleFlight()
+    claude = ClaudeService(client=client, flights=flights)
+    
+    studying = claude.stream_flashcards("letters")
+    assert next(studying) == {"question": "A?", "answer": "a"}
+    # The follow-up deck is requested while the first one is still streaming in
+    prefetched = list(claude.stream_flashcards("letters", kind='prefetch'))
+    list(studying)
+    
+    assert len(prefetched) == 2
+    assert len(client.messages.calls) == 2
+    assert flights.calls == 2 and flights.coalesced == 0
+
+def test_errors_reach_every_waiter():
+    client = FakeClient([], delay=0.2)
+    client.messages.error = RuntimeError("overloaded")
+    flights = SingleFlight()
+    
+    _, errors = run_concurrently(lambda: flights.do("letters", client.messages.create), 4)
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert len(client.messages.calls) == 1
+
+def test_followers_time_out_without_stopping_the_leader():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=("key", lambda: release.wait(5)))
+    leader.start()
+    time.sleep(0.05)
+    
+    with pytest.raises(TimeoutError):
+        flights.do("key", lambda: None, timeout=0.05)
+    release.set()
+    leader.join(timeout=5)
+    assert flights.calls == 1 and flights.coalesced == 1
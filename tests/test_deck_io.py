@@ -0,0 +1,66 @@
+import io
+import json
+from datetime import datetime
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.fakes import seed_users, sqlite_db
+from deck_io import export_deck, export_file, import_deck, read_cards
+
+NOW = datetime(2026, 10, 17, 9, 30)
+TEACHER, STUDENT = 'user0000000', 'user0000001'
+
+def deck_db():
+    db = sqlite_db()
+    seed_users(db, 2)
+    lines = io.StringIO('question,answer,topic\n'
+                        'Glycine?,G,Amino acids\n'
+                        '"Lysine, one letter?","K\n(basic)",Amino acids\n'
+                        'glycine? ,G,Amino acids\n'
+                        ',no question,\n')
+    assert import_deck(db, TEACHER, lines, 'csv', batch_size=2, now=NOW) == {
+        'imported': 2, 'duplicates': 1, 'invalid': 1
+    }
+    return db
+
+def test_csv_export_round_trips_into_another_deck():
+    db = deck_db()
+    exported = export_file(db, TEACHER, 'csv', batch_size=1).read().decode('utf-8')
+
+    lines = io.StringIO(exported, newline='')
+    assert import_deck(db, STUDENT, lines, 'csv')['imported'] == 2
+    # Importing again only finds duplicates
+    lines.seek(0)
+    assert import_deck(db, STUDENT, lines, 'csv') == {'imported': 0, 'duplicates': 2, 'invalid': 0}
+    assert [card['answer'] for card in read_cards(io.StringIO(exported, newline=''), 'csv')] == ["G", "K\n(basic)"]
+
+def test_export_streams_one_chunk_per_batch():
+    chunks = list(export_deck(deck_db(), TEACHER, 'jsonl', batch_size=1))
+
+    assert len(chunks) == 2
+    assert json.loads(chunks[1])['question'] == "Lysine, one letter?"
+
+def test_anki_text_keeps_topics_as_tags():
+    db = deck_db()
+    exported = "".join(export_deck(db, TEACHER, 'tsv'))
+    assert exported.startswith("#separator:tab")
+    assert "Lysine, one letter?\tK (basic)\tAmino_acids\n" in exported
+
+    cards = list(read_cards(io.StringIO(exported), 'tsv'))
+    assert cards[0] == {'question': "Glycine?", 'answer': "G", 'topic': "Amino acids"}
+
+def test_transfer_panel_renders():
+    def page(db):
+        from flashcard_ui import show_deck_transfer
+        show_deck_transfer(db, 'user0000000')
+
+    at = AppTest.from_function(page, args=(deck_db(),)).run()
+
+    assert not at.exception
+    assert at.radio(key="deck_format").options == ["CSV", "JSON Lines", "Anki (tab-separated)"]
+    # Nothing is exported until asked for
+    assert not at.get('download_button')
+
+    at.button[0].click().run()
+    assert not at.exception
+    assert len(at.get('download_button')) == 1
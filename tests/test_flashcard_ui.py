@@ -0,0 +1,31 @@
+from streamlit.testing.v1 import AppTest
+
+from flashcard_ui import THEME_PATH, theme_version
+
+def test_theme_version_follows_the_stylesheet_content(tmp_path):
+    path = tmp_path / "theme.css"
+    path.write_text("body { color: black; }")
+    first = theme_version(str(path))
+    other = tmp_path / "other.css"
+    other.write_text("body { color: white; }")
+
+    assert len(first) == 12
+    assert theme_version(str(other)) != first
+    assert theme_version(THEME_PATH) == theme_version(THEME_PATH)
+
+def test_reruns_send_a_link_to_the_theme_not_the_css():
+    def page():
+        from flashcard_ui import load_theme, show_feedback
+        load_theme()
+        show_feedback("Paris", "Paris", {'correct': True, 'explanation': "Right"})
+
+    at = AppTest.from_function(page).run()
+
+    assert not at.exception
+    style = at.get("html")[0].proto.body
+    assert '@import url("app/static/theme.css?v=' in style
+    assert len(style) < 100
+    # Correct answers switch the panel's class instead of injecting CSS
+    panel = at.main.children[0]
+    assert panel.proto.id.endswith("-feedback-correct")
+    assert len(at.get("html")) == 1
@@ -0,0 +1,93 @@
+from grading import Grader, GradingStats, EXACT, SIMILARITY, CACHED, LLM
+
+QUESTION = "What is the capital of France?"
+ANSWER = "The capital of France is Paris."
+
+def test_exact_tier():
+    grader = Grader()
+    
+    assert grader.grade(QUESTION, ANSWER, "the capital of france is paris")['tier'] == EXACT
+    assert grader.grade(QUESTION, ANSWER, "The capitol of France is Paris.")['correct']
+    
+    # Blank and "don't know" answers are wrong without asking Claude
+    for user_answer in ["", "   ", "I don't know"]:
+        verdict = grader.grade(QUESTION, ANSWER, user_answer)
+        assert verdict['tier'] == EXACT
+        assert not verdict['correct']
+
+def test_similarity_tier():
+    grader = Grader()
+    
+    # Words repeated from the question carry little weight
+    verdict = grader.grade(QUESTION, ANSWER, "Paris")
+    assert verdict['tier'] == SIMILARITY
+    assert verdict['correct']
+    assert grader.similarity(QUESTION, ANSWER, "capital of France") < grader.accept_threshold
+
+def test_ambiguous_answers_escalate():
+    grader = Grader()
+    
+    assert grader.grade(QUESTION, ANSWER, "Lyon") is None
+    assert grader.grade(QUESTION, ANSWER, "not Paris") is None
+    assert grader.grade(QUESTION, ANSWER, "The capital of France is not Paris") is None
+
+def test_near_exact_only_forgives_typos_in_longer_words():
+    grader = Grader()
+    
+    assert grader.grade("How is this disease caused?", "It is caused by a bacterium.",
+                        "It is cuased by a bacterium.")['tier'] == EXACT
+    # A near miss on a key word can be a different term
+    assert grader.grade("How is this disease caused?", "It is caused by a bacterium.",
+                        "It is caused by a bacteruim.") is None
+    assert grader.grade("Which amino acid has the code Q?", "Glutamine", "Glutamate") is None
+    assert grader.grade("Which amino acid has the code C?", "Cysteine", "Cystine") is None
+    # Changed numbers and key words escalate however close the strings are
+    assert grader.grade("When did World War II end?", "World War II ended in 1945.",
+                        "World War II ended in 1946.") is None
+    assert grader.grade("At what temperature does water boil?", "100 degrees Celsius at sea level",
+                        "10 degrees Celsius at sea level") is None
+    assert grader.grade("What is the capital of Austria?", "The capital of Austria is Vienna",
+                        "The capital of Australia is Vienna") is None
+
+def test_signs_and_symbols_are_part_of_the_answer():
+    grader = Grader()
+    
+    assert grader.grade("At what temperature do Celsius and Fahrenheit agree?", "-40", "40") is None
+    assert grader.grade("Which language added classes to C?", "C++", "C") is None
+    assert grader.grade("What is pi to two decimal places?", "3.14", "3.14.")['correct']
+    # "pass" is a non-answer unless it is the answer
+    assert grader.grade("Which Python statement does nothing?", "pass", "pass")['correct']
+    assert not grader.grade(QUESTION, ANSWER, "pass")['correct']
+
+def test_similarity_needs_every_key_word_in_order():
+    grader = Grader()
+    
+    assert grader.grade("Which planet is larger, Jupiter or Saturn?", "Jupiter is larger than Saturn",
+                        "Saturn is larger than Jupiter") is None
+    assert grader.grade("Is water a compound or a mixture?", "Water is a compound of hydrogen and oxygen",
+                        "Water is a mixture of hydrogen and oxygen") is None
+    verdict = grader.grade("What is water made of?", "Water is a compound of hydrogen and oxygen",
+                           "a compound of hydrogen and oxygen")
+    assert verdict['tier'] == SIMILARITY
+    assert verdict['correct']
+
+def test_reject_threshold():
+    grader = Grader(reject_threshold=0.0)
+    
+    verdict = grader.grade(QUESTION, ANSWER, "Lyon")
+    assert verdict['tier'] == SIMILARITY
+    assert not verdict['correct']
+
+def test_hit_rates():
+    stats = GradingStats()
+    grader = Grader(stats=stats)
+    
+    grader.grade(QUESTION, ANSWER, "")
+    grader.grade(QUESTION, ANSWER, "Paris")
+    # Escalated answers are counted by the caller once the feedback cache has been checked
+    assert grader.grade(QUESTION, ANSWER, "Lyon") is None
+    stats.record(CACHED)
+    stats.record(LLM)
+    
+    assert stats.counts() == {EXACT: 1, SIMILARITY: 1, CACHED: 1, LLM: 1}
+    assert stats.hit_rates()[LLM] == 0.25
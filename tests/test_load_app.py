@@ -0,0 +1,11 @@
+from benchmarks.load_app import run
+
+def test_learners_finish_a_study_session_through_the_real_app():
+    report = run(users=2, cards=3, llm_latency=0.0, chunk_delay=0.0)
+
+    assert report['errors'] == []
+    assert report['completed_sessions'] == 2
+    # Log in, pick a topic, then answer and rate or move on for each card
+    assert report['reruns'] >= 2 * (3 + 2 * 3)
+    assert report['llm_requests'] >= 1
+    assert report['rerun_p95_ms'] >= report['rerun_p50_ms'] > 0
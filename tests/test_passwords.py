@@ -0,0 +1,55 @@
+import os
+import signal
+
+import bcrypt
+import pytest
+
+from passwords import AdmissionLimiter, HashingBusy, PasswordHasher
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def test_hash_and_verify_run_in_worker_processes():
+    hasher = PasswordHasher(max_workers=1, rounds=4)
+    try:
+        hashed = hasher.hash("correct horse", username="alice")
+        assert bcrypt.checkpw(b"correct horse", hashed.encode())
+        assert hasher.verify("correct horse", hashed, username="alice")
+        assert not hasher.verify("wrong", hashed, username="alice")
+    finally:
+        hasher.shutdown()
+
+def test_a_dead_worker_is_replaced_instead_of_failing_every_later_call():
+    hasher = PasswordHasher(max_workers=1, rounds=4)
+    try:
+        hashed = hasher.hash("correct horse", username="alice")
+        broken = hasher.executor
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        
+        assert hasher.verify("correct horse", hashed, username="alice")
+        assert hasher.executor is not broken
+        assert not hasher.verify("wrong", hashed, username="alice")
+    finally:
+        hasher.shutdown()
+
+def test_admission_limits_each_key_within_its_window():
+    clock = Clock()
+    limiter = AdmissionLimiter({'user': 2, 'ip': 3}, window=60, clock=clock)
+    
+    limiter.admit([('user', 'alice'), ('ip', '10.0.0.1')])
+    limiter.admit([('user', 'alice'), ('ip', '10.0.0.1')])
+    with pytest.raises(HashingBusy):
+        limiter.admit([('user', 'alice'), ('ip', '10.0.0.1')])
+    
+    # A refused attempt is not counted against the IP
+    limiter.admit([('user', 'bob'), ('ip', '10.0.0.1')])
+    with pytest.raises(HashingBusy):
+        limiter.admit([('user', 'carol'), ('ip', '10.0.0.1')])
+    
+    clock.now = 61
+    limiter.admit([('user', 'alice'), ('ip', '10.0.0.1')])
@@ -0,0 +1,51 @@
+import pytest
+
+from perf import PrometheusExporter, SpanRecorder, prometheus_text, span, timed
+
+def test_span_records_even_when_the_block_raises():
+    recorder = SpanRecorder()
+    with span("ok", recorder):
+        pass
+    with pytest.raises(ValueError):
+        with span("boom", recorder):
+            raise ValueError()
+
+    assert recorder.totals()["ok"][0] == 1
+    assert recorder.totals()["boom"][0] == 1
+
+def test_summary_reports_quantiles_over_the_ring_buffer():
+    recorder = SpanRecorder(capacity=100)
+    for ms in range(1, 201):
+        recorder.record("db.get_due_cards", ms / 1000)
+
+    row = recorder.summary()["db.get_due_cards"]
+    # Only the most recent 100 spans are kept: 101..200 ms
+    assert row['count'] == 100
+    assert row['p50_ms'] == pytest.approx(151)
+    assert row['p95_ms'] == pytest.approx(196)
+    assert recorder.totals()["db.get_due_cards"][0] == 200
+
+def test_timed_covers_generators_until_exhausted():
+    @timed("test.generator")
+    def numbers():
+        yield 1
+        yield 2
+
+    assert list(numbers()) == [1, 2]
+    assert numbers.__name__ == "numbers"
+
+def test_prometheus_export(tmp_path):
+    recorder = SpanRecorder()
+    recorder.record('ui.show_question', 0.002)
+    recorder.record('ui.show_question', 0.004)
+
+    text = prometheus_text(recorder)
+    assert "# TYPE memapp_span_seconds summary" in text
+    assert 'memapp_span_seconds_count{span="ui.show_question"} 2' in text
+    assert 'memapp_span_seconds_sum{span="ui.show_question"} 0.006000' in text
+
+    path = tmp_path / "memapp.prom"
+    exporter = PrometheusExporter(str(path), interval=60, recorder=recorder)
+    assert exporter.maybe_export()
+    assert not exporter.maybe_export()
+    assert path.read_text() == text
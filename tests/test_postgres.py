@@ -0,0 +1,90 @@
+"""
+Bulk database paths with dialect-specific SQL: COPY into the review log and
+interval arithmetic for due dates. Every test runs on SQLite, and on Postgres
+too when STREAMLIT_TEST_DB_URL points at a disposable database, as in CI.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from benchmarks.fakes import PASSWORD_HASH, sqlite_db
+from database import DailyStats, Flashcard, Review, User, UserDB, init_schema
+from scheduling import Leitner, get_scheduler
+
+DB_URL = os.environ.get('STREAMLIT_TEST_DB_URL')
+NOW = datetime(2026, 10, 17, 9, 30)
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def db(request):
+    if request.param == 'postgresql':
+        if not DB_URL:
+            pytest.skip("STREAMLIT_TEST_DB_URL is not set")
+        engine = create_engine(DB_URL)
+        init_schema(engine)
+        db = UserDB(engine, Leitner())
+    else:
+        db = sqlite_db()
+    # Unique per test, so a shared database can't leak rows between tests
+    db.test_user = f"pg-{uuid.uuid4().hex[:12]}"
+    with db.engine.begin() as conn:
+        conn.execute(User.__table__.insert(), {'username': db.test_user, 'email': f"{db.test_user}@example.com",
+                                               'name': "Test User", 'password': PASSWORD_HASH})
+    yield db
+    with db.engine.begin() as conn:
+        for table in (Review.__table__, DailyStats.__table__, Flashcard.__table__):
+            conn.execute(table.delete().where(table.c.user_id == db.test_user))
+        conn.execute(User.__table__.delete().where(User.__table__.c.username == db.test_user))
+    db.engine.dispose()
+
+def review(db, question, correct, difficulty, reviewed_at=NOW, **log):
+    return db.review_params(db.test_user, question, f"{question} answer", correct, difficulty, reviewed_at,
+                            topic="Letters", **log)
+
+def cards(db):
+    with db.session_scope() as session:
+        return {card.question: (card.box_number, card.next_review)
+                for card in session.query(Flashcard).filter(Flashcard.user_id == db.test_user)}
+
+def logged(db):
+    with db.session_scope() as session:
+        return [(row.reviewed_at, row.correct, row.difficulty, row.latency_ms, row.grader_tier)
+                for row in session.query(Review).filter(Review.user_id == db.test_user).order_by(Review.id)]
+
+def test_save_flashcard_results_schedules_counts_and_copies_the_log(db):
+    db.save_flashcard_results([
+        review(db, "Q1", True, 'easy', latency_ms=2100, grader_tier='exact'),
+        review(db, "Q2", False, 'hard', grader_tier='llm'),
+        review(db, "Q1", True, 'easy', NOW + timedelta(days=3), latency_ms=900),
+    ])
+
+    assert cards(db) == {"Q1": (3, NOW + timedelta(days=10)), "Q2": (1, NOW + timedelta(days=1))}
+    # Empty fields go through COPY as NULLs
+    assert logged(db) == [
+        (NOW, True, 'easy', 2100, 'exact'),
+        (NOW, False, 'hard', None, 'llm'),
+        (NOW + timedelta(days=3), True, 'easy', 900, None),
+    ]
+    with db.session_scope() as session:
+        stats = session.query(DailyStats.day, DailyStats.reviews, DailyStats.correct) \
+                       .filter(DailyStats.user_id == db.test_user).order_by(DailyStats.day).all()
+    assert stats == [(NOW.date(), 2, 1), ((NOW + timedelta(days=3)).date(), 1, 1)]
+
+def test_prune_reviews_deletes_in_batches_past_retention(db):
+    db.save_flashcard_results([review(db, f"Q{day}", True, 'easy', NOW - timedelta(days=day))
+                               for day in range(10)])
+
+    assert db.prune_reviews(timedelta(days=7), batch_size=1, now=NOW) == 2
+    assert [row[0] for row in logged(db)] == [NOW - timedelta(days=day) for day in range(8)]
+
+def test_shift_due_dates_and_reschedule_do_date_arithmetic_in_sql(db):
+    db.save_flashcard_results([review(db, "Q1", True, 'easy'), review(db, "Q2", False, 'hard')])
+
+    assert db.shift_due_dates(db.test_user, 2) == 2
+    assert db.shift_due_dates(db.test_user, -0.5) == 2
+    assert cards(db) == {"Q1": (2, NOW + timedelta(days=4.5)), "Q2": (1, NOW + timedelta(days=2.5))}
+
+    assert db.reschedule(get_scheduler('sm2'), username=db.test_user) == 2
+    assert cards(db) == {"Q1": (2, NOW + timedelta(days=3)), "Q2": (1, NOW + timedelta(days=1))}
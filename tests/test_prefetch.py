@@ -0,0 +1,49 @@
+import threading
+
+from prefetch import PrefetchPool, Prefetcher
+
+def blocked(release, result=None):
+    """A prefetch that waits for `release` before returning"""
+    def fn():
+        release.wait(5)
+        return result
+    return fn
+
+def test_take_hands_over_the_deck_only_for_the_same_key():
+    prefetcher = Prefetcher(PrefetchPool())
+    prefetcher.request(('Enzymes', 5), lambda: ["card"])
+
+    assert prefetcher.take(('Enzymes', 10), timeout=1) is None
+    assert prefetcher.take(('Enzymes', 5), timeout=1) == ["card"]
+    # The buffer is emptied by a take
+    assert prefetcher.take(('Enzymes', 5), timeout=1) is None
+
+def test_changing_topic_cancels_the_queued_prefetch():
+    release = threading.Event()
+    pool = PrefetchPool(max_workers=1)
+    busy = Prefetcher(pool)
+    busy.request('Lipids', blocked(release))
+
+    prefetcher = Prefetcher(pool)
+    prefetcher.request('Enzymes', lambda: ["enzyme card"])
+    first = prefetcher._future
+    prefetcher.request('Amino acids', lambda: ["amino card"])
+
+    assert first.cancelled()
+    assert not prefetcher.pending('Enzymes')
+    release.set()
+    assert prefetcher.take('Amino acids', timeout=1) == ["amino card"]
+
+def test_pool_skips_prefetches_beyond_the_global_cap():
+    release = threading.Event()
+    pool = PrefetchPool(max_workers=1, max_in_flight=2)
+    sessions = [Prefetcher(pool) for _ in range(3)]
+    for session in sessions:
+        session.request('Enzymes', blocked(release, ["card"]))
+
+    assert [session.pending('Enzymes') for session in sessions] == [True, True, False]
+    release.set()
+    assert sessions[1].take('Enzymes', timeout=1) == ["card"]
+    # Finished prefetches free their slots
+    sessions[2].request('Enzymes', lambda: ["card"])
+    assert sessions[2].take('Enzymes', timeout=1) == ["card"]
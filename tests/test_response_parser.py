@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from response_parser import (
+    JSONArrayStreamParser, ResponseParseError, extract_json, iter_json_array_items,
+    parse_batch_feedback, parse_feedback, parse_flashcards
+)
+
+CARDS = '[{"question":"What is {X}?","answer":"X is \\"Y\\""},{"question":"Why [Z]?","answer":"Because W"}]'
+
+def test_stream_parser_yields_items_as_they_close():
+    parser = JSONArrayStreamParser()
+    
+    first_end = CARDS.index('},') + 1
+    assert parser.feed(CARDS[:first_end - 1]) == []
+    assert parser.feed(CARDS[first_end - 1:first_end]) == [{"question": "What is {X}?", "answer": 'X is "Y"'}]
+    assert parser.feed(CARDS[first_end:]) == [{"question": "Why [Z]?", "answer": "Because W"}]
+    assert parser.finished
+
+def test_stream_parser_handles_any_chunking_and_prose():
+    text = "Here are your cards:\n```json\n" + CARDS + "\n```\nEnjoy! [not a card]"
+    expected = list(iter_json_array_items([text]))
+    
+    for size in (1, 2, 3, 7, 64):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(iter_json_array_items(chunks)) == expected
+    assert len(expected) == 2
+
+def test_stream_parser_skips_bracketed_asides():
+    text = "See [1] for details:\n" + CARDS
+    for size in (1, 5, len(text)):
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        assert list(iter_json_array_items(chunks)) == json.loads(CARDS)
+
+def test_extract_json_skips_fences_and_prose():
+    text = "Sure! Here you go:\n```json\n" + CARDS + "\n```"
+    assert extract_json(text) == json.loads(CARDS)
+
+def test_extract_json_handles_nested_brackets_and_trailing_commas():
+    text = '[{"question":"Why [Z]?","answer":"Because {W}, mostly",},]'
+    assert extract_json(text) == [{"question": "Why [Z]?", "answer": "Because {W}, mostly"}]
+
+def test_extract_json_raises_without_json():
+    with pytest.raises(ResponseParseError):
+        extract_json("I could not generate flashcards for that topic.")
+
+def test_deep_nesting_is_a_parse_error():
+    for text in ["[" * 3000, "Here: " + "[" * 3000 + "]" * 3000]:
+        with pytest.raises(ResponseParseError):
+            extract_json(text)
+        with pytest.raises(ResponseParseError):
+            parse_feedback(text)
+    with pytest.raises(ResponseParseError):
+        list(iter_json_array_items(["[" + "[" * 3000 + "]" * 3000 + "]"]))
+
+def test_parse_flashcards_validates_cards():
+    text = 'See [1]. [{"question":"A?","answer":" a "},{"question":"","answer":"b"},{"q":"C?"}]'
+    assert parse_flashcards(text) == [{"question": "A?", "answer": "a"}]
+    
+    assert parse_flashcards('{"flashcards":[{"question":"A?","answer":"a"}]}') == [{"question": "A?", "answer": "a"}]
+    
+    with pytest.raises(ResponseParseError):
+        parse_flashcards('[{"question":"A?"}]')
+
+def test_parse_feedback():
+    assert parse_feedback('{"correct": "true", "explanation": "Right"}') == {"correct": True, "explanation": "Right"}
+    assert parse_feedback('[{"correct": false, "explanation": "No",}]') == {"correct": False, "explanation": "No"}
+    
+    with pytest.raises(ResponseParseError, match="Invalid feedback format"):
+        parse_feedback('{"correct": true}')
+
+def test_parse_batch_feedback():
+    text = '[{"index":1,"correct":true,"explanation":"b"},{"index":0,"correct":false,"explanation":"a"},{"index":2}]'
+    assert parse_batch_feedback(text) == {
+        0: {"correct": False, "explanation": "a"},
+        1: {"correct": True, "explanation": "b"}
+    }
+
+def test_batch_feedback_only_trusts_indices_that_number_every_item():
+    one_based = '[{"index":1,"correct":false,"explanation":"a"},{"index":2,"correct":true,"explanation":"b"}]'
+    assert parse_batch_feedback(one_based, count=2) == {
+        0: {"correct": False, "explanation": "a"},
+        1: {"correct": True, "explanation": "b"}
+    }
+    duplicated = '[{"index":0,"correct":false,"explanation":"a"},{"index":0,"correct":true,"explanation":"b"}]'
+    assert parse_batch_feedback(duplicated, count=2)[1] == {"correct": True, "explanation": "b"}
+    
+    # A missing verdict can't be placed by position
+    with pytest.raises(ResponseParseError):
+        parse_batch_feedback('[{"index":0,"correct":true,"explanation":"a"},'
+                             '{"index":2,"correct":true,"explanation":"c"}]', count=3)
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from benchmarks.fakes import seed_users, sqlite_db
+from database import Flashcard, Review
+
+NOW = datetime(2026, 10, 17, 9, 30)
+USER = 'user0000000'
+
+def logged(db):
+    with db.session_scope() as session:
+        return [(review.reviewed_at, review.correct, review.difficulty, review.latency_ms, review.grader_tier)
+                for review in session.query(Review).order_by(Review.id)]
+
+def test_every_review_is_appended_while_the_card_is_updated_in_place():
+    db = sqlite_db()
+    seed_users(db, 1)
+    db.save_flashcard_results([
+        db.review_params(USER, "Glycine?", "G", False, 'hard', NOW, latency_ms=5400, grader_tier='llm'),
+        db.review_params(USER, "Glycine?", "G", True, 'easy', NOW + timedelta(minutes=1),
+                         latency_ms=2100.4, grader_tier='exact'),
+    ])
+    db.save_flashcard_result(USER, "Glycine?", "G", True, 'medium')
+
+    with db.session_scope() as session:
+        assert session.query(Flashcard).count() == 1
+    history = logged(db)
+    assert history[:2] == [
+        (NOW, False, 'hard', 5400, 'llm'),
+        (NOW + timedelta(minutes=1), True, 'easy', 2100, 'exact'),
+    ]
+    assert history[2][1:] == (True, 'medium', None, None)
+
+def test_prune_drops_only_rows_past_retention():
+    db = sqlite_db()
+    seed_users(db, 1)
+    db.save_flashcard_results([db.review_params(USER, f"Q{day}?", "A", True, 'easy', NOW - timedelta(days=day))
+                               for day in range(10)])
+
+    assert db.prune_reviews(timedelta(days=7), batch_size=2, now=NOW) == 2
+    assert [row[0] for row in logged(db)] == [NOW - timedelta(days=day) for day in range(8)]
+    assert db.prune_reviews(timedelta(days=7), now=NOW) == 0
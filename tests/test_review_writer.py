@@ -0,0 +1,90 @@
+import time
+
+from benchmarks.fakes import seed_users, sqlite_db
+from database import Flashcard
+from review_writer import ReviewWriter
+
+USER = 'user0000000'
+
+def review(db, i):
+    return db.review_params(USER, f"Question {i}?", f"Answer {i}", True, 'easy')
+
+def saved(db):
+    with db.session_scope() as session:
+        return session.query(Flashcard).count()
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+def studied_db():
+    db = sqlite_db()
+    seed_users(db, 1)
+    return db
+
+class FlakyDB:
+    """Fails the first `failures` writes, then hands them to the real database"""
+
+    def __init__(self, db, failures):
+        self.db = db
+        self.failures = failures
+        self.attempts = 0
+
+    def save_flashcard_results(self, batch):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise RuntimeError("database unavailable")
+        self.db.save_flashcard_results(batch)
+
+def test_buffer_hands_off_at_the_size_threshold():
+    db = studied_db()
+    writer = ReviewWriter(db, max_size=3, max_age=60)
+    buffer = writer.new_buffer()
+    buffer.add(review(db, 0))
+    buffer.add(review(db, 1))
+    assert len(buffer) == 2
+
+    buffer.add(review(db, 2))
+    assert len(buffer) == 0
+    assert wait_until(lambda: saved(db) == 3)
+    writer.close()
+
+def test_idle_buffers_are_swept_after_max_age():
+    db = studied_db()
+    writer = ReviewWriter(db, max_size=100, max_age=0.05)
+    # The session adds one review and never comes back
+    writer.new_buffer().add(review(db, 0))
+
+    assert wait_until(lambda: saved(db) == 1)
+    writer.close()
+
+def test_close_drains_every_buffer_and_the_queue():
+    db = studied_db()
+    writer = ReviewWriter(db, max_size=100, max_age=60)
+    first, second = writer.new_buffer(), writer.new_buffer()
+    first.add(review(db, 0))
+    second.add(review(db, 1))
+    second.add(review(db, 2))
+    first.flush()
+
+    writer.close()
+    assert saved(db) == 3
+
+def test_failed_writes_are_retried_then_dropped(caplog):
+    db = studied_db()
+    flaky = FlakyDB(db, failures=2)
+    writer = ReviewWriter(flaky, max_size=100, max_age=60, retry_delay=0)
+    writer._write([review(db, 0)])
+    assert flaky.attempts == 3
+    assert saved(db) == 1
+
+    writer.db = broken = FlakyDB(db, failures=10)
+    writer._write([review(db, 1)], attempts=3)
+    assert broken.attempts == 3
+    assert saved(db) == 1
+    assert "Dropping 1 review results after 3 attempts" in caplog.text
+    writer.close()
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from benchmarks.fakes import seed_users, sqlite_db
+from database import Flashcard, UserDB
+from scheduling import SM2, Leitner, Scheduler, get_scheduler
+
+NOW = datetime(2026, 10, 17, 9, 30)
+
+def review(question, correct, difficulty, reviewed_at=NOW, user='user0000000'):
+    return UserDB.review_params(user, question, f"{question} answer", correct, difficulty, reviewed_at)
+
+def test_leitner_moves_whole_arrays_of_cards():
+    state = {
+        'box_number': np.array([1, 3, 5, 2]),
+        'ease_factor': np.full(4, 2.5),
+        'interval_days': np.zeros(4),
+        'repetitions': np.array([0, 2, 4, 1])
+    }
+    new = Leitner().review(state, np.array([True, True, True, False]),
+                           np.array(['easy', 'medium', 'easy', 'hard']))
+
+    assert new['box_number'].tolist() == [2, 3, 5, 1]
+    assert new['interval_days'].tolist() == [3, 7, 30, 1]
+    assert new['repetitions'].tolist() == [1, 3, 5, 0]
+
+def test_sm2_ease_and_intervals():
+    state = {
+        'box_number': np.ones(3),
+        'ease_factor': np.array([2.5, 2.5, 1.3]),
+        'interval_days': np.array([6.0, 6.0, 10.0]),
+        'repetitions': np.array([1, 2, 4])
+    }
+    new = SM2().review(state, np.array([True, True, False]), np.array(['easy', 'hard', 'hard']))
+
+    assert new['repetitions'].tolist() == [2, 3, 0]
+    assert new['ease_factor'] == pytest.approx([2.6, 2.36, 1.3])
+    assert new['interval_days'] == pytest.approx([6.0, 6.0 * 2.36, 1.0])
+
+def test_incomplete_scheduler_fails_when_created():
+    class ReviewOnly(Scheduler):
+        def review(self, state, correct, difficulty):
+            return state
+
+    with pytest.raises(TypeError):
+        ReviewOnly()
+
+def test_schedule_applies_repeated_reviews_in_order():
+    rows = Leitner().schedule({}, [
+        review("Q1", True, 'easy'),
+        review("Q2", False, 'hard'),
+        review("Q1", True, 'easy', NOW + timedelta(days=3)),
+    ])
+
+    by_question = {row['question']: row for row in rows}
+    assert len(rows) == 2
+    assert by_question["Q1"]['box_number'] == 3
+    assert by_question["Q1"]['next_review'] == NOW + timedelta(days=10)
+    assert by_question["Q2"]['box_number'] == 1
+
+def test_bulk_shift_and_reschedule_run_in_the_database():
+    db = sqlite_db()
+    seed_users(db, 2)
+    db.save_flashcard_results([review("Q1", True, 'easy'), review("Q2", True, 'medium'),
+                               review("Q3", True, 'easy', user='user0000001')])
+
+    assert db.shift_due_dates('user0000000', 2) == 2
+    with db.session_scope() as session:
+        due = dict(session.query(Flashcard.question, Flashcard.next_review))
+    assert due["Q1"] == NOW + timedelta(days=5)
+    assert due["Q2"] == NOW + timedelta(days=3)
+    assert due["Q3"] == NOW + timedelta(days=3)
+
+    # Back to the dates the stored state implies, now with SM-2
+    assert db.reschedule(get_scheduler('sm2')) == 3
+    with db.session_scope() as session:
+        due = dict(session.query(Flashcard.question, Flashcard.next_review))
+    assert due["Q1"] == NOW + timedelta(days=3)
+    assert due["Q2"] == NOW + timedelta(days=1)
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.fakes import seed_users, sqlite_db
+from database import init_schema, question_hash
+
+def test_mixed_case_login_uses_the_lowercase_index():
+    db = sqlite_db()
+    seed_users(db, 50)
+
+    assert db.get_user_credential('USER0000007')['name'] == "User 7"
+    with db.engine.connect() as conn:
+        plan = conn.execute(text("EXPLAIN QUERY PLAN SELECT username FROM users "
+                                 "WHERE lower(username) = 'user0000007'")).all()
+    assert 'ix_users_username_lower' in str(plan)
+
+def test_upgrade_fills_question_hashes_and_keeps_the_newest_duplicate():
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.begin() as conn:
+        # Tables as created before cards had a question_hash
+        conn.execute(text("CREATE TABLE users (username VARCHAR PRIMARY KEY, email VARCHAR, "
+                          "name VARCHAR, password VARCHAR, created_at DATETIME)"))
+        conn.execute(text("CREATE TABLE flashcards (id INTEGER PRIMARY KEY, user_id VARCHAR, question VARCHAR, "
+                          "answer VARCHAR, box_number INTEGER, next_review DATETIME, "
+                          "last_difficulty VARCHAR, created_at DATETIME)"))
+        conn.execute(text("INSERT INTO flashcards (id, user_id, question, answer, box_number, next_review) VALUES "
+                          "(1, 'ann', 'What is Glycine?', 'G', 1, '2026-10-18 09:00:00.000000'), "
+                          "(2, 'ann', 'what is  glycine?', 'G', 3, '2026-10-24 09:00:00.000000'), "
+                          "(3, 'bob', 'What is Glycine?', 'G', 2, '2026-10-20 09:00:00.000000'), "
+                          "(4, 'ann', 'What is Lysine?', 'K', 1, '2026-10-18 09:00:00.000000')"))
+
+    init_schema(engine)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id, user_id, question_hash, box_number FROM flashcards ORDER BY id")).all()
+    assert [(row.id, row.user_id, row.box_number) for row in rows] == [(2, 'ann', 3), (3, 'bob', 2), (4, 'ann', 1)]
+    assert [row.question_hash for row in rows] == [question_hash("What is Glycine?")] * 2 + [question_hash("What is Lysine?")]
+
+    indexes = {index['name']: index for index in inspect(engine).get_indexes('flashcards')}
+    assert indexes['uq_flashcards_user_question']['unique']
+    assert indexes['uq_flashcards_user_question']['column_names'] == ['user_id', 'question_hash']
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO flashcards (user_id, question, question_hash) "
+                          f"VALUES ('bob', 'WHAT IS GLYCINE?', '{question_hash('WHAT IS GLYCINE?')}')"))